@@ -0,0 +1,157 @@
+"""
+Benchmark : coût de la gestion des connexions DB par requête.
+
+    python benchmarks/bench_db_connections.py --requests 2000 --handshake-ms 3
+
+Compare trois configurations sur la même base SQLite jetable :
+- "nouvelle"    : CONN_MAX_AGE=0, une connexion ouverte puis fermée par requête ;
+- "persistante" : CONN_MAX_AGE=60 + CONN_HEALTH_CHECKS ;
+- "pool"        : backend core.db.sqlite3 (même pool que core.db.mysql).
+
+Chaque "requête" reproduit le cycle Django (signaux request_started /
+request_finished) autour de 3 requêtes SQL. SQLite s'ouvre en quelques dizaines
+de µs : --handshake-ms ajoute une attente à chaque ouverture de connexion pour
+simuler le handshake TCP + auth MySQL vers host.docker.internal.
+Sortie : JSON sur stdout (latences par mode + stats du pool).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+MODES = {
+    "nouvelle": {"ENGINE": "django.db.backends.sqlite3", "CONN_MAX_AGE": 0},
+    "persistante": {"ENGINE": "django.db.backends.sqlite3", "CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": True},
+    "pool": {"ENGINE": "core.db.sqlite3", "CONN_MAX_AGE": 0},
+}
+
+
+def setup(db_path, pool_size):
+    databases = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": db_path}}
+    for alias, conf in MODES.items():
+        databases[alias] = {**conf, "NAME": db_path}
+    databases["pool"]["POOL"] = {"size": pool_size, "max_overflow": pool_size}
+    settings.configure(
+        INSTALLED_APPS=["django.contrib.auth", "django.contrib.contenttypes", "core"],
+        DATABASES=databases,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        USE_TZ=True,
+        DEFAULT_AUTO_FIELD="django.db.models.BigAutoField",
+    )
+    django.setup()
+
+
+def seed():
+    from django.db import connection, transaction
+    from core.models_legacy import BrandAmbassadors, Commissions
+
+    with connection.schema_editor() as editor:
+        for model in (BrandAmbassadors, Commissions):
+            editor.create_model(model)
+    with transaction.atomic(), connection.cursor() as cur:
+        cur.executemany(
+            "INSERT INTO brand_ambassadors (id, nom, prenom, email, telephone, password_hash) VALUES (?, ?, ?, ?, ?, '')",
+            [(i, f"Nom{i}", f"Prenom{i}", f"ba{i}@bench.cg", f"06{i:07d}") for i in range(1, 101)],
+        )
+    connection.close()
+
+
+def slow_handshake(delay):
+    """Ajoute `delay` secondes à chaque ouverture de connexion SQLite."""
+    from django.db.backends.sqlite3 import base
+
+    connect = base.Database.connect
+
+    def _connect(*args, **kwargs):
+        time.sleep(delay)
+        return connect(*args, **kwargs)
+
+    base.Database.connect = _connect
+
+
+def run(alias, n_requests, n_threads):
+    from django.core.signals import request_finished, request_started
+    from django.db import connections
+    from core.models_legacy import BrandAmbassadors, Commissions
+
+    latencies = []
+    lock = threading.Lock()
+    per_thread = n_requests // n_threads
+
+    def worker(offset):
+        mine = []
+        for i in range(per_thread):
+            ba_id = (offset + i) % 100 + 1
+            t0 = time.perf_counter()
+            request_started.send(sender=None)
+            BrandAmbassadors.objects.using(alias).filter(id=ba_id).only("id", "nom").first()
+            Commissions.objects.using(alias).filter(ba_id=ba_id).count()
+            Commissions.objects.using(alias).filter(ba_id=ba_id, statut="EN_ATTENTE").exists()
+            request_finished.send(sender=None)
+            mine.append((time.perf_counter() - t0) * 1000)
+        # Fin du thread : on rend / ferme ce qui reste ouvert
+        connections[alias].close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker, args=(k * per_thread,)) for k in range(n_threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--handshake-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fd, db_path = tempfile.mkstemp(suffix=".sqlite3")
+    os.close(fd)
+    try:
+        setup(db_path, args.pool_size)
+        seed()
+        if args.handshake_ms:
+            slow_handshake(args.handshake_ms / 1000)
+        from core.db.pool import pool_stats
+
+        results = {alias: run(alias, args.requests, args.threads) for alias in MODES}
+        base = results["nouvelle"]["mean_ms"]
+        for alias in ("persistante", "pool"):
+            results[alias]["saved_per_request_ms"] = round(base - results[alias]["mean_ms"], 3)
+        print(json.dumps({
+            "threads": args.threads,
+            "handshake_ms": args.handshake_ms,
+            "results": results,
+            "pool": pool_stats().get("pool"),
+        }, indent=2))
+    finally:
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    main()
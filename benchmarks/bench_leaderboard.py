@@ -0,0 +1,101 @@
+"""
+Benchmark : coût de `rebuild_leaderboard` sur une base SQLite jetable.
+
+    python benchmarks/bench_leaderboard.py --bas 10000 --commissions 5000000
+
+N'utilise pas config.settings (pas de MySQL requis) : les tables legacy sont
+créées dans un fichier SQLite temporaire puis remplies en masse.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def setup(db_path):
+    settings.configure(
+        INSTALLED_APPS=["django.contrib.auth", "django.contrib.contenttypes", "core"],
+        DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": db_path}},
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        USE_TZ=True,
+        DEFAULT_AUTO_FIELD="django.db.models.BigAutoField",
+    )
+    django.setup()
+
+
+def seed(n_bas, n_commissions):
+    from django.db import connection, transaction
+    from django.utils import timezone
+    from core.models import LeaderboardEntry
+    from core.models_legacy import BrandAmbassadors, Commissions
+
+    with connection.schema_editor() as editor:
+        for model in (BrandAmbassadors, Commissions, LeaderboardEntry):
+            editor.create_model(model)
+    # Une seule transaction : en autocommit SQLite ferait un fsync par ligne
+    with transaction.atomic(), connection.cursor() as cur:
+        cur.execute("CREATE INDEX commissions_created_ba ON commissions (created_at, ba_id)")
+        cur.executemany(
+            "INSERT INTO brand_ambassadors (id, nom, prenom, email, telephone, password_hash) VALUES (?, ?, ?, ?, ?, '')",
+            [(i, f"Nom{i}", f"Prenom{i}", f"ba{i}@bench.cg", f"06{i:07d}") for i in range(1, n_bas + 1)],
+        )
+        now = timezone.now()
+        rnd = random.Random(42)
+        chunk = 100_000
+        for start in range(0, n_commissions, chunk):
+            rows = []
+            for _ in range(min(chunk, n_commissions - start)):
+                driver = rnd.random() < 0.3
+                created = now - timedelta(minutes=rnd.randrange(0, 60 * 24 * 180))
+                rows.append((
+                    rnd.randint(1, n_bas),
+                    "ENROLL_DRIVER" if driver else "ENROLL_PASSENGER",
+                    5000 if driver else 500,
+                    "CHAUFFEUR" if driver else "PASSAGER",
+                    "PENDING",
+                    created.strftime("%Y-%m-%d %H:%M:%S"),
+                ))
+            cur.executemany(
+                "INSERT INTO commissions (ba_id, type, montant, recrue_type, statut, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bas", type=int, default=10_000)
+    parser.add_argument("--commissions", type=int, default=5_000_000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup(os.path.join(tmp, "bench.sqlite3"))
+        t0 = time.perf_counter()
+        seed(args.bas, args.commissions)
+        print(f"seed: {args.bas} BA, {args.commissions} commissions en {time.perf_counter() - t0:.1f}s")
+
+        from core.leaderboard import get_top, rebuild_leaderboard
+
+        for run in range(1, args.runs + 1):
+            t0 = time.perf_counter()
+            total, changed = rebuild_leaderboard()
+            print(f"rebuild #{run}: {total} BA, {changed} rangs modifiés, {time.perf_counter() - t0:.2f}s")
+
+        n = 10_000
+        t0 = time.perf_counter()
+        for _ in range(n):
+            get_top(20)
+        print(f"get_top(20): {(time.perf_counter() - t0) / n * 1e6:.1f}µs / appel")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark des services BA à différents volumes de données legacy.
+
+    python benchmarks/bench_services.py --scales 1000,100000,1000000 --runs 20 --out bench.json
+
+Pour chaque échelle (nombre de recrues, cf. datagen.plan) : base SQLite jetable
+remplie par datagen.py (index de core.indexes compris), puis chronométrage de
+get_dashboard_payload, get_recent_recruits, get_challenges (cache vide puis
+cache chaud) et des deux enrôlements, pour le plus gros BA. Chaque échelle
+tourne dans son propre process (settings Django configurés une seule fois).
+Sortie JSON : à conserver d'une version à l'autre pour repérer les régressions.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import datagen
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[max(0, int(len(samples) * 0.95) - 1)], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def measure(func, runs, prepare=None):
+    """Durées (ms) de `runs` appels ; `prepare` (non chronométré) avant chacun."""
+    samples = []
+    for i in range(runs):
+        arg = prepare(i) if prepare else None
+        t0 = time.perf_counter()
+        func(arg)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def count_queries(func):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as ctx:
+        func()
+    return len(ctx.captured_queries)
+
+
+def run_scale(rows, runs, ba_index):
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.db import transaction
+    from core import services
+
+    t0 = time.perf_counter()
+    counts = datagen.generate(rows)
+    seed_seconds = time.perf_counter() - t0
+    username = f"ba{ba_index}@bench.cg"
+
+    def fresh_user(_=None):
+        cache.clear()
+        return User.objects.get(username=username)
+
+    warm_user = fresh_user()
+    results = {}
+    for name, service in (
+        ("get_dashboard_payload", services.get_dashboard_payload),
+        ("get_recent_recruits", services.get_recent_recruits),
+        ("get_challenges", services.get_challenges),
+    ):
+        service(warm_user)
+        results[name] = {
+            "cold": summarize(measure(service, runs, prepare=fresh_user)),
+            "warm": summarize(measure(lambda _: service(warm_user), runs)),
+        }
+        user = fresh_user()
+        results[name]["queries_cold"] = count_queries(lambda: service(user))
+
+    def enroll(create, post_for):
+        def call(i):
+            with transaction.atomic():
+                create(warm_user, post_for(i))
+        return call
+
+    driver = enroll(services.create_driver_enrollment, lambda i: {
+        "name": f"Bench Chauffeur{i}", "phone": f"BD{i:08d}", "zone": services.ZONES[0],
+        "vehicleNumber": f"Z{datagen._plate(i)[1:]}", "vehicleModel": "Toyota Corolla",
+    })
+    passenger = enroll(services.create_passenger_enrollment, lambda i: {
+        "name": f"Bench Passager{i}", "phone": f"BP{i:08d}",
+    })
+    for name, call in (("create_driver_enrollment", driver), ("create_passenger_enrollment", passenger)):
+        samples = []
+        for i in range(runs):
+            t0 = time.perf_counter()
+            call(i)
+            samples.append((time.perf_counter() - t0) * 1000)
+        results[name] = {"cold": summarize(samples), "queries_cold": count_queries(lambda: call(runs))}
+    return {"rows": counts, "seed_seconds": round(seed_seconds, 1), "ba": username, "services": results}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default="1000,100000,1000000",
+                        help="Nombres de recrues, séparés par des virgules.")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--ba", type=int, default=1, help="Rang du BA mesuré (1 = le plus gros).")
+    parser.add_argument("--out", help="Fichier JSON de sortie (stdout par défaut).")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with tempfile.TemporaryDirectory() as tmp:
+            datagen.configure_sqlite(os.path.join(tmp, "bench.sqlite3"))
+            print(json.dumps(run_scale(args.child, args.runs, args.ba)))
+        return
+
+    import django
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "runs": args.runs,
+        },
+        "scales": {},
+    }
+    for scale in (int(s) for s in args.scales.split(",")):
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", str(scale), "--runs", str(args.runs), "--ba", str(args.ba)],
+            capture_output=True, text=True,
+        )
+        if out.returncode:
+            sys.stderr.write(out.stderr)
+            sys.exit(f"Échec à l'échelle {scale}")
+        report["scales"][str(scale)] = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{scale} recrues : ok", file=sys.stderr)
+
+    data = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(data + "\n")
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Générateur de données legacy synthétiques (BA, stations, chauffeurs, passagers,
+commissions, challenges, transactions), reproductible (graine fixe).
+
+    python benchmarks/datagen.py --rows 100000 --sqlite /tmp/taxiconnect.sqlite3
+    DJANGO_SETTINGS_MODULE=config.settings python benchmarks/datagen.py --rows 100000
+
+`rows` = nombre de recrues (chauffeurs + passagers). On en déduit : une
+commission par recrue, autant de transactions, un BA pour 200 recrues (10 au
+minimum), réparties de façon inégale (quelques gros BA, beaucoup de petits).
+Sans --sqlite, utilise la base de DJANGO_SETTINGS_MODULE : les tables legacy
+manquantes sont créées, les tables existantes doivent être vides.
+Utilisé aussi par bench_services.py.
+"""
+import argparse
+import itertools
+import os
+import random
+import string
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+CHUNK = 50_000
+BENCH_PASSWORD = "bench"
+
+
+def configure_sqlite(db_path):
+    settings.configure(
+        INSTALLED_APPS=[
+            "django.contrib.auth", "django.contrib.contenttypes", "django.contrib.sessions", "core",
+        ],
+        DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": db_path}},
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+        USE_TZ=True,
+        DEFAULT_AUTO_FIELD="django.db.models.BigAutoField",
+    )
+    django.setup()
+
+
+def plan(rows):
+    """Volumes générés pour `rows` recrues."""
+    drivers = rows * 2 // 5
+    return {
+        "bas": max(10, rows // 200),
+        "drivers": drivers,
+        "passengers": rows - drivers,
+        "commissions": rows,
+        "transactions": rows,
+        "challenges": 10,
+    }
+
+
+def _plate(i):
+    # Immatriculation unique de 6 caractères (base 36 de l'id)
+    digits = string.digits + string.ascii_uppercase
+    out = ""
+    for _ in range(6):
+        i, r = divmod(i, 36)
+        out = digits[r] + out
+    return out
+
+
+def _insert(cursor, table, columns, rows):
+    """INSERT par paquets de CHUNK lignes (`rows` peut être un générateur)."""
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, CHUNK))
+        if not chunk:
+            return
+        cursor.executemany(sql, chunk)
+
+
+def create_schema():
+    from django.core.management import call_command
+    from django.db import connection
+    from core import models_legacy as legacy
+
+    call_command("migrate", verbosity=0)
+    existing = set(connection.introspection.table_names())
+    with connection.schema_editor() as editor:
+        for model in (
+            legacy.BrandAmbassadors, legacy.Stations, legacy.Challenges, legacy.Chauffeurs,
+            legacy.Passagers, legacy.Commissions, legacy.Notifications,
+            legacy.ParticipationsChallenges, legacy.Transactions,
+        ):
+            if model._meta.db_table not in existing:
+                editor.create_model(model)
+
+
+def generate(rows, seed=42, users=20, indexes=True, now=None):
+    """
+    Remplit la base configurée et renvoie les volumes générés. Les `users` plus
+    gros BA reçoivent un compte Django (mot de passe BENCH_PASSWORD).
+    """
+    from django.contrib.auth.models import User
+    from django.db import connection, transaction
+    from django.utils import timezone
+    from core.counters import rebuild_ba_counters
+    from core.indexes import apply_missing_indexes
+    from core.leaderboard import rebuild_leaderboard
+    from core.models import BAProfile
+    from core.services import ZONES
+
+    now = now or timezone.now()
+    counts = plan(rows)
+    rnd = random.Random(seed)
+    dt = connection.ops.adapt_datetimefield_value
+
+    def when(max_days=180):
+        return dt(now - timedelta(minutes=rnd.randrange(max_days * 24 * 60)))
+
+    n_bas = counts["bas"]
+    # Poids décroissants : le BA 1 recrute le plus, la longue traîne très peu
+    # (exposant 0.5 : à 1M recrues, commission_totale du BA 1 tient en DECIMAL(10, 2))
+    weights = list(itertools.accumulate(1 / (k ** 0.5) for k in range(1, n_bas + 1)))
+
+    def pick_ba():
+        return rnd.choices(range(1, n_bas + 1), cum_weights=weights)[0]
+
+    create_schema()
+    with transaction.atomic(), connection.cursor() as cur:
+        _insert(cur, "brand_ambassadors", ["id", "nom", "prenom", "email", "telephone", "password_hash", "statut", "created_at", "updated_at"], [
+            (i, f"Nom{i}", f"Prenom{i}", f"ba{i}@bench.cg", f"BA{i:08d}", "", "ACTIF", when(365), dt(now))
+            for i in range(1, n_bas + 1)
+        ])
+        _insert(cur, "stations", ["id", "nom", "ville", "latitude", "longitude", "actif", "created_at"], [
+            (i, zone, "Brazzaville", str(round(-4.27 + rnd.uniform(-0.08, 0.08), 6)),
+             str(round(15.28 + rnd.uniform(-0.08, 0.08), 6)), 1, dt(now))
+            for i, zone in enumerate(ZONES, start=1)
+        ])
+        _insert(cur, "challenges", ["id", "titre", "type", "objectif_type", "objectif_valeur", "date_debut", "date_fin", "actif", "created_at"], [
+            (i, f"Challenge {i}", "MENSUEL", ["CHAUFFEURS", "PASSAGERS", "RECRUES", "COMMISSIONS", "CHAUFFEURS_ACTIFS"][i % 5],
+             10 * i, dt(now - timedelta(days=i)), dt(now + timedelta(days=30 - i)), int(i <= 7), dt(now))
+            for i in range(1, counts["challenges"] + 1)
+        ])
+
+        driver_ba = {}
+
+        def drivers():
+            for i in range(1, counts["drivers"] + 1):
+                ba, created = pick_ba(), when()
+                driver_ba[i] = (ba, created)
+                active = rnd.random() < 0.3
+                yield (i, ba, rnd.randint(1, len(ZONES)), f"Chauffeur{i}", "X", f"D{i:09d}", _plate(i), "Toyota",
+                       "ACTIF" if active else "INSCRIT", created if active else None, created, created)
+
+        _insert(cur, "chauffeurs", ["id", "ba_id", "station_id", "nom", "prenom", "telephone", "vehicule_immatriculation",
+                                    "vehicule_marque", "statut", "date_activation", "created_at", "updated_at"], drivers())
+
+        passenger_ba = {}
+
+        def passengers():
+            for i in range(1, counts["passengers"] + 1):
+                ba, created = pick_ba(), when()
+                passenger_ba[i] = (ba, created)
+                active = rnd.random() < 0.2
+                yield (i, ba, f"Passager{i}", "Y", f"P{i:09d}", "ACTIF" if active else "INSCRIT",
+                       rnd.randint(1, 40) if active else 0, created, created)
+
+        _insert(cur, "passagers", ["id", "ba_id", "nom", "prenom", "telephone", "statut", "total_courses",
+                                   "created_at", "updated_at"], passengers())
+
+        def commissions():
+            # Une commission par recrue, créée en même temps qu'elle
+            for i, (ba, created) in driver_ba.items():
+                yield (ba, "ENROLL_DRIVER", 5000, "CHAUFFEUR", i, "PENDING", created)
+            for i, (ba, created) in passenger_ba.items():
+                yield (ba, "ENROLL_PASSENGER", 500, "PASSAGER", i, "PENDING", created)
+
+        _insert(cur, "commissions", ["ba_id", "type", "montant", "recrue_type", "recrue_id", "statut", "created_at"],
+                commissions())
+        del driver_ba, passenger_ba
+
+        def transactions():
+            for _ in range(counts["transactions"]):
+                lat, lon = -4.27 + rnd.uniform(-0.1, 0.1), 15.28 + rnd.uniform(-0.1, 0.1)
+                yield (rnd.randint(1, max(1, counts["drivers"])), rnd.randint(1, max(1, counts["passengers"])),
+                       rnd.randint(5, 50) * 100, str(round(lat, 6)), str(round(lon, 6)),
+                       str(round(lat + rnd.uniform(-0.05, 0.05), 6)), str(round(lon + rnd.uniform(-0.05, 0.05), 6)),
+                       "TERMINEE", when())
+
+        _insert(cur, "transactions", ["chauffeur_id", "passager_id", "montant", "depart_latitude", "depart_longitude",
+                                      "arrivee_latitude", "arrivee_longitude", "statut", "created_at"], transactions())
+
+        for i in range(1, min(users, n_bas) + 1):
+            user = User.objects.create_user(username=f"ba{i}@bench.cg", email=f"ba{i}@bench.cg", password=BENCH_PASSWORD)
+            BAProfile.objects.create(user=user, monthly_target=100)
+
+    if indexes:
+        apply_missing_indexes()
+    rebuild_ba_counters()
+    rebuild_leaderboard()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000, help="Nombre de recrues (chauffeurs + passagers).")
+    parser.add_argument("--sqlite", help="Fichier SQLite à créer (sinon : base de DJANGO_SETTINGS_MODULE).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=20, help="Comptes Django créés pour les plus gros BA.")
+    parser.add_argument("--no-indexes", action="store_true", help="Ne pas créer les index de core.indexes.")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        if os.path.exists(args.sqlite):
+            parser.error(f"{args.sqlite} existe déjà")
+        configure_sqlite(args.sqlite)
+    else:
+        django.setup()
+    t0 = time.perf_counter()
+    counts = generate(args.rows, seed=args.seed, users=args.users, indexes=not args.no_indexes)
+    print(f"{counts} en {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Test de charge de /app/ : N BA connectés en parallèle, latences p50 / p95 / p99.
+
+    python benchmarks/loadtest_app.py --url http://127.0.0.1:8000 --users users.csv \\
+        --concurrency 200 --requests 10 --path "/app/?tab=dashboard"
+
+Contre un serveur en HTTP (runserver), le serveur doit tourner avec
+SECURE_COOKIES=0 : sinon les cookies de session et CSRF sont marqués Secure, ne
+reviennent pas sur http:// et la connexion échoue. En HTTPS, rien à changer.
+
+users.csv : une ligne "email,mot_de_passe" par BA (un client par ligne, cycliques
+si --concurrency dépasse le nombre de lignes). Sortie : JSON sur stdout.
+Uniquement la bibliothèque standard : lançable depuis n'importe quelle machine.
+"""
+import argparse
+import csv
+import http.cookiejar
+import json
+import statistics
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+
+def make_client(base, email, password):
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    opener.open(f"{base}/").read()
+    token = next((c.value for c in jar if c.name == "csrftoken"), "")
+    data = urllib.parse.urlencode({
+        "action": "login", "email": email, "password": password, "csrfmiddlewaretoken": token,
+    }).encode()
+    req = urllib.request.Request(f"{base}/", data=data, headers={"Referer": f"{base}/"})
+    opener.open(req).read()
+    if not any(c.name == "sessionid" for c in jar):
+        hint = " (serveur HTTP : le lancer avec SECURE_COOKIES=0)" if base.startswith("http:") else ""
+        raise RuntimeError(f"Connexion impossible pour {email}{hint}")
+    return opener
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[k]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", required=True)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=10, help="Requêtes par client.")
+    parser.add_argument("--path", default="/app/?tab=dashboard")
+    args = parser.parse_args()
+
+    with open(args.users, newline="") as fh:
+        creds = [(r[0], r[1]) for r in csv.reader(fh) if r]
+    clients = [
+        make_client(args.url, *creds[i % len(creds)]) for i in range(args.concurrency)
+    ]
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start = threading.Barrier(args.concurrency + 1)
+
+    def worker(opener):
+        start.wait()
+        local, failed = [], 0
+        for _ in range(args.requests):
+            t0 = time.perf_counter()
+            try:
+                with opener.open(f"{args.url}{args.path}") as res:
+                    res.read()
+                local.append((time.perf_counter() - t0) * 1000)
+            except Exception:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in clients]
+    for t in threads:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({
+        "path": args.path,
+        "concurrency": args.concurrency,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 1) if latencies else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
 
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
@@ -14,3 +15,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# Préchargement du registre des stations (sinon chargé au premier enrôlement)
+try:
+    from core.stations import warm_station_registry
+    warm_station_registry()
+except Exception:
+    # Base indisponible au démarrage : le registre sera chargé au premier accès
+    logging.getLogger("core.stations").exception("Préchargement du registre des stations impossible")
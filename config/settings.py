@@ -27,7 +27,9 @@ environ.Env.read_env(BASE_DIR / '.env')
 SECRET_KEY = 'django-insecure-xl(qt&s9_ux)7yi!lz%jas(d9i1m4=1(8z-t48fo%64@w+oods'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Désactivé par défaut : DEBUG=1 dans .env en local (cf. .env.example), sinon
+# `collectstatic` est nécessaire avant de servir la moindre page.
+DEBUG = env("DEBUG")
 
 ALLOWED_HOSTS = ["*"]
 
@@ -35,15 +37,11 @@ ALLOWED_HOSTS = ["*"]
 
 
 
-
-MIDDLEWARE.insert(1, "whitenoise.middleware.WhiteNoiseMiddleware")
-
-
-
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 USE_X_FORWARDED_HOST = True
-CSRF_COOKIE_SECURE = True
-SESSION_COOKIE_SECURE = True
+# Cookies de session / CSRF réservés à HTTPS. SECURE_COOKIES=0 uniquement pour
+# un serveur local en HTTP (runserver, benchmarks/loadtest_app.py).
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE = env.bool("SECURE_COOKIES", default=True)
 
 
 
@@ -64,10 +62,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Fichiers statiques servis avant tout le reste (ni session ni requête SQL)
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.BrandAmbassadorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,7 +78,8 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates chronométré (temps de rendu dans Server-Timing / métriques)
+        'BACKEND': 'core.metrics.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / "core" / "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -90,7 +93,18 @@ TEMPLATES = [
     },
 ]
 
+# Instrumentation (core.metrics) : en-tête Server-Timing, /metrics (Prometheus)
+# et budgets de requêtes SQL par vue (core.metrics.DEFAULT_VIEW_BUDGETS).
+# Dépassement : warning en production, exception si VIEW_BUDGETS_STRICT (CI).
+SERVER_TIMING = env.bool("SERVER_TIMING", default=True)
+VIEW_BUDGETS_STRICT = env.bool("VIEW_BUDGETS_STRICT", default=False)
+# /metrics exige "Authorization: Bearer <METRICS_TOKEN>" ; sans jeton, 404
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+# Sert /app/ avec la vue async (à activer avec le serveur ASGI, cf. start.sh)
+BA_APP_ASYNC = env.bool("BA_APP_ASYNC", default=False)
 
 
 # Database
@@ -116,9 +130,101 @@ DATABASES = {
             "charset": "utf8mb4",
             "init_command": "SET sql_mode='STRICT_TRANS_TABLES'",
         },
+        # Connexion gardée d'une requête à l'autre (par thread), vérifiée avant
+        # réutilisation : plus de handshake TCP + auth MySQL à chaque requête.
+        # ⚠️ Garder DB_CONN_MAX_AGE sous le wait_timeout du serveur MySQL.
+        "CONN_MAX_AGE": env.int("DB_CONN_MAX_AGE", default=60),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Pool de connexions par worker (core/db/pool.py), partagé entre les threads
+# du worker : utile en ASGI / vue async où chaque thread ouvrirait sa connexion.
+DB_POOL = env.bool("DB_POOL", default=False)
+if DB_POOL:
+    DATABASES["default"].update(
+        ENGINE="core.db.mysql",
+        # La connexion est rendue au pool en fin de requête, pas gardée par le thread
+        CONN_MAX_AGE=0,
+        POOL={
+            "size": env.int("DB_POOL_SIZE", default=5),
+            "max_overflow": env.int("DB_POOL_MAX_OVERFLOW", default=5),
+            "timeout": env.float("DB_POOL_TIMEOUT", default=10.0),
+            "recycle": env.int("DB_POOL_RECYCLE", default=3600),
+        },
+    )
+
+# Cache
+# LocMem par défaut ; Redis (partagé entre workers) si REDIS_URL est défini.
+# Le backend Redis nécessite le paquet `redis` (optionnel).
+REDIS_URL = env("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "taxiconnect",
+        }
+    }
+# Contrat de cohérence : les process hors web (run_outbox, commandes de rebuild)
+# invalident les caches des BA qu'ils modifient. Ces invalidations ne sont vues
+# des workers web qu'avec un cache partagé (REDIS_URL) ; `run_outbox` refuse de
+# démarrer sans. Après un enrôlement, le dashboard reflète la commission et les
+# compteurs dès que le worker a traité l'événement (quelques secondes).
+# Avec LocMem (dev, un seul process), les valeurs peuvent rester périmées
+# jusqu'à BA_CACHE_TTL / NOTIFICATIONS_UNREAD_TTL.
+# Durée de vie (secondes) des payloads dashboard / challenges / recrues par BA
+BA_CACHE_TTL = env.int("BA_CACHE_TTL", default=120)
+# Durée de vie (secondes) du top du classement en cache : délai max avant qu'un
+# worker voie le snapshot écrit par `rebuild_leaderboard`
+LEADERBOARD_CACHE_TTL = env.int("LEADERBOARD_CACHE_TTL", default=300)
+# Durée max (secondes) du BA mémorisé en session avant relecture MySQL
+BA_SESSION_TTL = env.int("BA_SESSION_TTL", default=300)
+# Délai (minutes) avant qu'une transaction soit agrégée par `rollup_transactions`
+# (le statut d'une course en cours peut encore changer)
+ROLLUP_LAG_MINUTES = env.int("ROLLUP_LAG_MINUTES", default=120)
+# Seuils de `recompute_distances` : au-delà, la course est signalée (RideAnomaly)
+RIDE_MAX_KM = env.float("RIDE_MAX_KM", default=150.0)
+RIDE_MAX_SPEED_KMH = env.float("RIDE_MAX_SPEED_KMH", default=130.0)
+# Durée de vie (secondes) du compteur de notifications non lues par BA
+NOTIFICATIONS_UNREAD_TTL = env.int("NOTIFICATIONS_UNREAD_TTL", default=300)
+# Rechargement périodique (secondes) du registre des stations de chaque worker
+STATIONS_REFRESH = env.int("STATIONS_REFRESH", default=300)
+# Distance max (km) entre une position (enrôlement, départs de courses) et sa station
+STATIONS_MAX_KM = env.float("STATIONS_MAX_KM", default=15.0)
+
+# Sessions
+# SESSION_MODE : "cached_db" (défaut, lecture en cache puis MySQL si absente),
+# "signed_cookies" (aucune lecture serveur, session limitée à ~4 Ko) ou "db".
+# Purge des sessions expirées : `manage.py purge_sessions` (par lots).
+SESSION_MODE = env("SESSION_MODE", default="cached_db")
+SESSION_ENGINE = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}[SESSION_MODE]
+
+# Authentification : request.user (et son ba_profile) servi depuis le cache.
+# ModelBackend reste listé pour les sessions ouvertes avant ce backend.
+AUTHENTICATION_BACKENDS = [
+    "core.auth.CachedModelBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+AUTH_USER_CACHE_TTL = env.int("AUTH_USER_CACHE_TTL", default=300)
+# Session absente / expirée : @login_required renvoie vers la page de connexion
+# de l'app (et non /accounts/login/, qui n'existe pas)
+LOGIN_URL = "login"
+
+# Durée (secondes) pendant laquelle le résultat d'un enrôlement est rejoué à
+# l'identique si le même formulaire est renvoyé (cf. core.idempotency)
+IDEMPOTENCY_TTL = env.int("IDEMPOTENCY_TTL", default=600)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -154,8 +260,14 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
 STATIC_URL = 'static/'
-STATICFILES_DIRS = [BASE_DIR / "core" / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
+# CSS généré par `manage.py build_assets` (core/static/core/app.css, versionné).
+# collectstatic : noms avec empreinte (app.<hash>.css) + variantes .gz / .br ;
+# WhiteNoise sert ces fichiers avec Cache-Control max-age=10 ans, immutable.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -0,0 +1,193 @@
+"""
+API JSON en lecture seule pour l'app mobile, limitée au BA connecté.
+
+- pagination par clé (created_at, id) : ?cursor=... sans OFFSET ;
+- champs à la demande : ?fields=id,nom,created_at (colonnes chargées via .only()) ;
+- ETag / If-None-Match : 304 sans corps si la page n'a pas changé.
+"""
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework import permissions, serializers, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models_legacy import Chauffeurs, Commissions, Notifications, Passagers
+from .notifications import mark_all_read, mark_read, unread_count
+from .services import get_ba_from_user
+
+
+class KeysetPagination(BasePagination):
+    """Pagination par clé sur (created_at DESC, id DESC) ; les dates vides viennent en dernier."""
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            size = max(1, min(int(request.query_params.get("page_size", self.page_size)), self.max_page_size))
+        except ValueError:
+            size = self.page_size
+        queryset = queryset.order_by("-created_at", "-id")
+        raw = request.query_params.get(self.cursor_query_param)
+        if raw:
+            ts, pk = self.decode_cursor(raw)
+            if ts is None:
+                queryset = queryset.filter(created_at__isnull=True, id__lt=pk)
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=ts) | Q(created_at__isnull=True) | Q(created_at=ts, id__lt=pk)
+                )
+        rows = list(queryset[:size + 1])
+        self.has_next = len(rows) > size
+        page = rows[:size]
+        self.last = page[-1] if page else None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last))
+
+    @staticmethod
+    def encode_cursor(obj):
+        ts = obj.created_at.isoformat() if obj.created_at else ""
+        return base64.urlsafe_b64encode(f"{ts}|{obj.pk}".encode()).decode()
+
+    @staticmethod
+    def decode_cursor(raw):
+        try:
+            ts, _, pk = base64.urlsafe_b64decode(raw.encode()).decode().partition("|")
+            return (datetime.fromisoformat(ts) if ts else None), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound("Curseur invalide.")
+
+
+class ETagMixin:
+    """ETag calculé sur le contenu de la réponse ; 304 si If-None-Match correspond."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method in ("GET", "HEAD") and response.status_code == 200:
+            body = json.dumps(response.data, sort_keys=True, default=str).encode()
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            if etag in request.headers.get("If-None-Match", ""):
+                response = Response(status=304)
+            response["ETag"] = etag
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class BAScopedViewSet(ETagMixin, viewsets.ReadOnlyModelViewSet):
+    """Base : lignes du BA connecté (self.ba), champs restreints par ?fields=."""
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    model = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # BA de l'utilisateur DRF : avec BasicAuthentication, request.ba (middleware)
+        # reste celui d'un anonyme. Compte sans profil BA (staff...) : 403.
+        if not hasattr(request.user, "ba_profile"):
+            raise PermissionDenied("Compte sans profil Brand Ambassador.")
+        self.ba = get_ba_from_user(request.user)
+
+    def requested_fields(self):
+        allowed = self.get_serializer_class().Meta.fields
+        raw = self.request.query_params.get("fields")
+        if not raw:
+            return list(allowed)
+        fields = [f for f in raw.split(",") if f]
+        unknown = set(fields) - set(allowed)
+        if unknown:
+            raise ValidationError({"fields": f"Champs inconnus : {', '.join(sorted(unknown))}"})
+        return fields
+
+    def get_queryset(self):
+        # id / created_at sont toujours nécessaires à la pagination
+        only = set(self.requested_fields()) | {"id", "created_at"}
+        return self.model.objects.filter(ba_id=self.ba.id).only(*only)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        keep = set(self.requested_fields())
+        fields = serializer.child.fields if hasattr(serializer, "child") else serializer.fields
+        for name in list(fields):
+            if name not in keep:
+                fields.pop(name)
+        return serializer
+
+
+class DriverSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Chauffeurs
+        fields = [
+            "id", "nom", "prenom", "telephone", "email", "station_id", "vehicule_immatriculation",
+            "vehicule_marque", "vehicule_modele", "statut", "date_activation", "created_at",
+        ]
+
+
+class PassengerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Passagers
+        fields = ["id", "nom", "prenom", "telephone", "email", "statut", "created_at"]
+
+
+class CommissionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Commissions
+        fields = [
+            "id", "type", "montant", "recrue_type", "recrue_id", "statut",
+            "date_validation", "date_paiement", "created_at",
+        ]
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notifications
+        fields = ["id", "titre", "message", "type", "data", "lu", "date_lecture", "created_at"]
+
+
+class DriverViewSet(BAScopedViewSet):
+    model = Chauffeurs
+    serializer_class = DriverSerializer
+
+
+class PassengerViewSet(BAScopedViewSet):
+    model = Passagers
+    serializer_class = PassengerSerializer
+
+
+class CommissionViewSet(BAScopedViewSet):
+    model = Commissions
+    serializer_class = CommissionSerializer
+
+
+class NotificationViewSet(BAScopedViewSet):
+    model = Notifications
+    serializer_class = NotificationSerializer
+
+    @action(detail=False, methods=["get"])
+    def unread(self, request):
+        return Response({"unread": unread_count(self.ba.id)})
+
+    @action(detail=False, methods=["post"])
+    def read(self, request):
+        """Marque comme lues les notifications `ids` (toutes si absent) : un seul UPDATE."""
+        ids = request.data.get("ids")
+        if ids is None:
+            n = mark_all_read(self.ba.id)
+        elif isinstance(ids, list) and all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            n = mark_read(self.ba.id, ids)
+        else:
+            raise ValidationError({"ids": "Liste d'entiers attendue."})
+        return Response({"read": n, "unread": unread_count(self.ba.id)})
@@ -0,0 +1,43 @@
+"""
+Chargement de `request.user` depuis le cache.
+
+AuthenticationMiddleware relit auth_user à chaque requête (puis ba_profile au
+premier accès). CachedModelBackend garde l'utilisateur, profil BA inclus, en
+cache AUTH_USER_CACHE_TTL secondes ; toute modification du User ou du BAProfile
+(mot de passe, last_login, objectif mensuel...) supprime l'entrée (cf. signals).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+CACHED_BACKEND = "core.auth.CachedModelBackend"
+
+
+def user_cache_key(user_id) -> str:
+    return f"auth:user:{user_id}"
+
+
+def cache_user(user):
+    """Met l'utilisateur (profil BA inclus) en cache, comme le ferait get_user."""
+    hasattr(user, "ba_profile")  # charge le profil (ou son absence) avant la mise en cache
+    cache.set(user_cache_key(user.pk), user, getattr(settings, "AUTH_USER_CACHE_TTL", 300))
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            User = get_user_model()
+            try:
+                # Le profil BA est lu dans la même requête et voyage avec l'utilisateur
+                user = User._default_manager.select_related("ba_profile").get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            cache_user(user)
+        return user if self.user_can_authenticate(user) else None
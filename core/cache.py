@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.cache import cache
+
+# Backends dont le contenu n'est visible que du process qui l'écrit
+LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+# Sections du dashboard BA mises en cache (une clé par BA et par section)
+BA_SECTIONS = ("dashboard", "challenges", "recruits")
+
+
+def ba_cache_key(ba_id, section: str) -> str:
+    return f"ba:{ba_id}:{section}"
+
+
+def cache_is_shared(alias="default") -> bool:
+    """Vrai si une écriture / invalidation faite ici est vue des autres process (Redis...)."""
+    return settings.CACHES[alias]["BACKEND"] not in LOCAL_CACHE_BACKENDS
+
+
+def get_or_compute(ba_id, section: str, compute):
+    """
+    Renvoie la section en cache pour ce BA, sinon la calcule et la stocke (TTL).
+    ⚠️ Avec LocMemCache chaque worker gunicorn a son propre cache : l'invalidation
+    ne touche que le worker courant, les autres se mettent à jour au bout du TTL.
+    Utiliser Redis (REDIS_URL) pour une invalidation partagée.
+    """
+    key = ba_cache_key(ba_id, section)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, getattr(settings, "BA_CACHE_TTL", 120))
+    return value
+
+
+def invalidate_ba_cache(ba_id):
+    cache.delete_many([ba_cache_key(ba_id, s) for s in BA_SECTIONS])
+
+
+def invalidate_ba_caches(ba_ids):
+    cache.delete_many([ba_cache_key(ba_id, s) for ba_id in ba_ids for s in BA_SECTIONS])
+
+
+def get_ba_revision(ba_id) -> int:
+    """Révision de la ligne brand_ambassadors (incrémentée à chaque modification connue)."""
+    return cache.get(f"ba:{ba_id}:rev", 0)
+
+
+def bump_ba_revision(ba_id):
+    key = f"ba:{ba_id}:rev"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def bump_ba_revisions(ba_ids):
+    """Comme bump_ba_revision, pour un lot de BA (un get_many + un set_many)."""
+    keys = [f"ba:{ba_id}:rev" for ba_id in ba_ids]
+    current = cache.get_many(keys)
+    cache.set_many({k: current.get(k, 0) + 1 for k in keys}, None)
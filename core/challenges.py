@@ -0,0 +1,135 @@
+"""
+Progression des challenges (Challenges.objectif_type / objectif_valeur).
+
+Toutes les progressions sont calculées en un GROUP BY par table concernée
+(chauffeurs / passagers / commissions), avec un agrégat conditionnel par
+challenge : le nombre de requêtes ne dépend pas du nombre de challenges.
+"""
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .cache import invalidate_ba_caches
+from .counters import ACTIVE_DRIVER_Q
+from .models_legacy import Challenges, Chauffeurs, Commissions, ParticipationsChallenges, Passagers
+
+# objectif_type -> liste de (modèle, agrégat, filtre additionnel) dont on additionne les valeurs
+CHALLENGE_METRICS = {
+    "CHAUFFEURS": [(Chauffeurs, Count, Q())],
+    "CHAUFFEURS_ACTIFS": [(Chauffeurs, Count, ACTIVE_DRIVER_Q)],
+    "PASSAGERS": [(Passagers, Count, Q())],
+    "RECRUES": [(Chauffeurs, Count, Q()), (Passagers, Count, Q())],
+    "COMMISSIONS": [(Commissions, Sum, Q())],
+}
+# Challenge sans objectif_type renseigné : on compte les recrues
+DEFAULT_METRIC = "RECRUES"
+
+
+def get_active_challenges(now=None):
+    now = now or timezone.now()
+    return list(
+        Challenges.objects.filter(actif=1, date_debut__lte=now, date_fin__gte=now).order_by("date_fin")
+    )
+
+
+def _metric(ch):
+    return CHALLENGE_METRICS.get((ch.objectif_type or DEFAULT_METRIC).strip().upper(), [])
+
+
+def compute_progress(challenges, ba_ids=None):
+    """
+    Renvoie {ba_id: {challenge_id: valeur}} pour les challenges donnés,
+    limité à `ba_ids` si fourni (None = tous les BA).
+    """
+    columns = {}
+    for ch in challenges:
+        window = Q(created_at__gte=ch.date_debut, created_at__lte=ch.date_fin)
+        for model, agg, extra in _metric(ch):
+            field = "montant" if agg is Sum else "id"
+            columns.setdefault(model, {})[f"c{ch.id}"] = agg(field, filter=window & extra)
+    out = {}
+    for model, cols in columns.items():
+        # Recrues sans BA (passagers de l'ancienne app) : aucune participation à créer
+        qs = model.objects.filter(
+            ba_id__isnull=False,
+            created_at__gte=min(ch.date_debut for ch in challenges),
+            created_at__lte=max(ch.date_fin for ch in challenges),
+        )
+        if ba_ids is not None:
+            qs = qs.filter(ba_id__in=list(ba_ids))
+        for row in qs.order_by().values("ba_id").annotate(**cols):
+            per_ba = out.setdefault(row["ba_id"], {})
+            for alias in cols:
+                ch_id = int(alias[1:])
+                per_ba[ch_id] = per_ba.get(ch_id, 0) + int(row[alias] or 0)
+    return out
+
+
+def get_ba_challenges(ba_id, now=None):
+    """Challenges actifs avec la progression du BA (format template)."""
+    challenges = get_active_challenges(now)
+    progress = compute_progress(challenges, ba_ids=[ba_id]).get(ba_id, {}) if challenges else {}
+    out = []
+    for ch in challenges:
+        current = progress.get(ch.id, 0)
+        target = max(1, ch.objectif_valeur or 0)
+        out.append({
+            "id": ch.id,
+            "title": ch.titre,
+            "description": ch.description or "",
+            "current": current,
+            "target": ch.objectif_valeur,
+            "progress": int(min(100, current * 100 / target)),
+            "completed": current >= target,
+            "endsIn": ch.date_fin.strftime("%d/%m/%Y") if ch.date_fin else "",
+        })
+    return out
+
+
+def sync_participations(ba_ids=None, batch_size=1000, now=None):
+    """
+    Met à jour participations_challenges.progression / completed pour tous les BA
+    (ou `ba_ids`) et tous les challenges actifs en une passe :
+    GROUP BY par table + bulk_update des lignes modifiées + bulk_create des nouvelles.
+    Un challenge déjà complété le reste. Renvoie (nb créées, nb mises à jour).
+    """
+    now = now or timezone.now()
+    challenges = get_active_challenges(now)
+    if not challenges:
+        return 0, 0
+    by_id = {ch.id: ch for ch in challenges}
+    progress = compute_progress(challenges, ba_ids=ba_ids)
+    existing_qs = ParticipationsChallenges.objects.filter(challenge_id__in=list(by_id)).only(
+        "id", "ba_id", "challenge_id", "progression", "completed", "date_completion"
+    )
+    if ba_ids is not None:
+        existing_qs = existing_qs.filter(ba_id__in=list(ba_ids))
+    existing = {(p.ba_id, p.challenge_id): p for p in existing_qs.iterator()}
+    to_create, to_update, touched = [], [], set()
+    keys = set(existing) | {(ba_id, ch_id) for ba_id, per_ba in progress.items() for ch_id in per_ba}
+    for ba_id, ch_id in keys:
+        value = progress.get(ba_id, {}).get(ch_id, 0)
+        done = value >= by_id[ch_id].objectif_valeur
+        p = existing.get((ba_id, ch_id))
+        if p is None:
+            if value <= 0:
+                continue
+            to_create.append(ParticipationsChallenges(
+                ba_id=ba_id, challenge_id=ch_id, progression=value, completed=int(done),
+                date_completion=now if done else None, recompense_recue=0,
+                created_at=now, updated_at=now,
+            ))
+        else:
+            completed = bool(p.completed) or done
+            if p.progression == value and bool(p.completed) == completed:
+                continue
+            if completed and not p.date_completion:
+                p.date_completion = now
+            p.progression, p.completed, p.updated_at = value, int(completed), now
+            to_update.append(p)
+        touched.add(ba_id)
+    ParticipationsChallenges.objects.bulk_create(to_create, batch_size=batch_size)
+    ParticipationsChallenges.objects.bulk_update(
+        to_update, ["progression", "completed", "date_completion", "updated_at"], batch_size=batch_size
+    )
+    invalidate_ba_caches(touched)
+    return len(to_create), len(to_update)
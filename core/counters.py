@@ -0,0 +1,119 @@
+"""
+Compteurs matérialisés de brand_ambassadors (total_chauffeurs, total_passagers,
+chauffeurs_actifs, commission_mois, commission_totale).
+
+- incrémentés avec F() dans la transaction d'enrôlement ;
+- reconstruits en masse par `manage.py rebuild_ba_counters` (à planifier au
+  moins le 1er du mois : c'est lui qui remet commission_mois à zéro).
+
+commission_mois n'est tenu que pour les lecteurs historiques de la table : le
+dashboard calcule la commission du mois par un agrégat borné au mois.
+
+NULL = compteur jamais initialisé : NULL + 1 reste NULL en SQL, le dashboard
+le détecte et calcule les valeurs à la lecture (sans écrire).
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .cache import invalidate_ba_caches
+from .models_legacy import BrandAmbassadors, Chauffeurs, Commissions, Passagers
+
+COUNTER_FIELDS = [
+    "total_chauffeurs",
+    "total_passagers",
+    "chauffeurs_actifs",
+    "commission_mois",
+    "commission_totale",
+]
+
+ACTIVE_DRIVER_Q = Q(statut__in=["ACTIF", "ACTIVE"]) | Q(date_activation__isnull=False)
+
+
+def month_start(now=None):
+    now = now or timezone.now()
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def increment_ba_counters(ba_id, drivers=0, passengers=0, active_drivers=0, commission=0):
+    """
+    UPDATE atomique (F()) des compteurs du BA. À appeler dans la transaction
+    qui crée la recrue / la commission.
+    """
+    now = timezone.now()
+    commission = Decimal(commission)
+    return BrandAmbassadors.objects.filter(pk=ba_id).update(
+        total_chauffeurs=F("total_chauffeurs") + drivers,
+        total_passagers=F("total_passagers") + passengers,
+        chauffeurs_actifs=F("chauffeurs_actifs") + active_drivers,
+        commission_mois=F("commission_mois") + commission,
+        commission_totale=F("commission_totale") + commission,
+        updated_at=now,
+    )
+
+
+def compute_ba_counters(ba_ids, now=None):
+    """
+    Valeurs des compteurs recalculées depuis chauffeurs / passagers / commissions
+    (3 GROUP BY, aucune écriture) : {ba_id: {champ: valeur}}.
+    """
+    since = month_start(now)
+    ba_ids = list(ba_ids)
+    drivers = {
+        r["ba_id"]: r
+        for r in Chauffeurs.objects.filter(ba_id__in=ba_ids).order_by().values("ba_id").annotate(
+            total=Count("id"), active=Count("id", filter=ACTIVE_DRIVER_Q)
+        )
+    }
+    passengers = dict(
+        Passagers.objects.filter(ba_id__in=ba_ids).order_by().values("ba_id")
+        .annotate(total=Count("id")).values_list("ba_id", "total")
+    )
+    commissions = {
+        r["ba_id"]: r
+        for r in Commissions.objects.filter(ba_id__in=ba_ids).order_by().values("ba_id").annotate(
+            total=Sum("montant"), month=Sum("montant", filter=Q(created_at__gte=since))
+        )
+    }
+    out = {}
+    for ba_id in ba_ids:
+        d = drivers.get(ba_id, {})
+        c = commissions.get(ba_id, {})
+        out[ba_id] = {
+            "total_chauffeurs": d.get("total", 0),
+            "chauffeurs_actifs": d.get("active", 0),
+            "total_passagers": passengers.get(ba_id, 0),
+            "commission_mois": c.get("month") or 0,
+            "commission_totale": c.get("total") or 0,
+        }
+    return out
+
+
+def rebuild_ba_counters(ba_ids=None, batch_size=500):
+    """
+    Recalcule les compteurs (compute_ba_counters) et les écrit, par lots de BA
+    (3 GROUP BY + 1 bulk_update par lot), puis invalide les caches des BA du lot.
+    Les lignes du lot sont verrouillées (SELECT ... FOR UPDATE, ordre des id) avant
+    le calcul : un increment_ba_counters concurrent attend l'écriture au lieu
+    d'être écrasé par elle. Renvoie le nombre de BA traités.
+    """
+    now = timezone.now()
+    qs = BrandAmbassadors.objects.order_by("id")
+    if ba_ids is not None:
+        qs = qs.filter(id__in=list(ba_ids))
+    ids = list(qs.values_list("id", flat=True))
+    done = 0
+    for i in range(0, len(ids), batch_size):
+        with transaction.atomic():
+            chunk = list(
+                BrandAmbassadors.objects.select_for_update().filter(id__in=ids[i:i + batch_size])
+                .order_by("id").values_list("id", flat=True)
+            )
+            values = compute_ba_counters(chunk, now)
+            objs = [BrandAmbassadors(id=ba_id, updated_at=now, **fields) for ba_id, fields in values.items()]
+            BrandAmbassadors.objects.bulk_update(objs, COUNTER_FIELDS + ["updated_at"])
+        invalidate_ba_caches(chunk)
+        done += len(objs)
+    return done
@@ -0,0 +1,17 @@
+"""
+Backend MySQL (PyMySQL) avec pool de connexions par worker.
+
+    DATABASES["default"]["ENGINE"] = "core.db.mysql"
+    DATABASES["default"]["POOL"] = {"size": 5, "max_overflow": 5, "timeout": 10}
+
+Garder CONN_MAX_AGE = 0 : Django "ferme" la connexion en fin de requête, ce qui
+la rend au pool, et chaque thread (vue async, ASGI) emprunte dans le même pool.
+"""
+from django.db.backends.mysql.base import DatabaseWrapper as MySQLDatabaseWrapper
+
+from ..pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, MySQLDatabaseWrapper):
+    def pool_ping(self, conn):
+        conn.ping(reconnect=False)
@@ -0,0 +1,219 @@
+"""
+Pool de connexions en mémoire (par process / worker gunicorn).
+
+Activé via DB_POOL=1 (cf. settings) : le backend `core.db.mysql` prend ses
+connexions dans le pool au lieu d'ouvrir une connexion TCP + auth MySQL à
+chaque requête, et les y remet quand Django les ferme (fin de requête).
+
+- taille bornée : `size` connexions gardées au repos, `max_overflow` connexions
+  supplémentaires autorisées en pointe (fermées dès qu'elles sont rendues) ;
+- au-delà, on attend qu'une connexion soit rendue, au plus `timeout` secondes ;
+- une connexion restée inactive plus de `ping_after` secondes est vérifiée
+  avant d'être prêtée, et elle est recréée au bout de `recycle` secondes (à
+  garder sous le wait_timeout MySQL) ;
+- stats() expose les compteurs du worker, dont le temps d'attente au checkout.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+POOL_DEFAULTS = {"size": 5, "max_overflow": 5, "timeout": 10.0, "recycle": 3600, "ping_after": 30}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, ping, close, size=5, max_overflow=5, timeout=10.0, recycle=3600, ping_after=30):
+        self._connect = connect
+        self._ping = ping
+        self._close = close
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._cond = threading.Condition()
+        # (connexion, créée à, rendue à) — LIFO : la plus récente ressort en premier
+        self._idle = deque()
+        self._born = {}
+        self._open = 0
+        self._stats = {
+            "checkouts": 0,
+            "waited": 0,
+            "wait_total_ms": 0.0,
+            "wait_max_ms": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "closed": 0,
+            "pings_failed": 0,
+        }
+
+    def checkout(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, born, returned = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._record_wait(started)
+                    self._stats["timeouts"] += 1
+                    logger.warning("Pool DB saturé (%s connexions), attente > %ss", self._open, self.timeout)
+                    raise PoolTimeout(f"Aucune connexion libre après {self.timeout}s")
+                self._cond.wait(remaining)
+            self._record_wait(started)
+            self._stats["checkouts"] += 1
+
+        if conn is not None:
+            now = time.monotonic()
+            stale = now - born > self.recycle
+            if not stale and now - returned > self.ping_after and not self._alive(conn):
+                stale = True
+                with self._cond:
+                    self._stats["pings_failed"] += 1
+            if not stale:
+                return conn
+            # On garde la place dans le pool : la connexion est remplacée
+            self._discard(conn, release=False)
+        return self._new()
+
+    def checkin(self, conn, broken=False):
+        with self._cond:
+            keep = not broken and conn in self._born and len(self._idle) < self.size
+            if keep:
+                self._idle.append((conn, self._born[conn], time.monotonic()))
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats, pid=os.getpid(), open=self._open, idle=len(self._idle),
+                        size=self.size, max_overflow=self.max_overflow)
+        attempts = data["checkouts"] + data["timeouts"]
+        data["wait_avg_ms"] = data["wait_total_ms"] / attempts if attempts else 0.0
+        return data
+
+    def dispose(self):
+        with self._cond:
+            idle = [c for c, _, _ in self._idle]
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def _record_wait(self, started):
+        waited = (time.monotonic() - started) * 1000
+        self._stats["wait_total_ms"] += waited
+        if waited >= 1:
+            self._stats["waited"] += 1
+        self._stats["wait_max_ms"] = max(self._stats["wait_max_ms"], waited)
+
+    def _new(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._born[conn] = time.monotonic()
+            self._stats["created"] += 1
+        return conn
+
+    def _alive(self, conn):
+        try:
+            self._ping(conn)
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn, release=True):
+        with self._cond:
+            self._born.pop(conn, None)
+            self._stats["closed"] += 1
+            if release:
+                self._open -= 1
+                self._cond.notify()
+        try:
+            self._close(conn)
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, ping, close, options=None):
+    """Pool de l'alias DB pour ce process (créé au premier appel)."""
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                pool = _pools[alias] = ConnectionPool(connect, ping, close, **{**POOL_DEFAULTS, **(options or {})})
+    return pool
+
+
+def pool_stats():
+    """Compteurs des pools de ce worker, par alias DB."""
+    return {alias: pool.stats() for alias, pool in _pools.items()}
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    À placer devant le DatabaseWrapper d'un backend Django : get_new_connection
+    emprunte au pool, _close rend la connexion au lieu de la fermer.
+    Les options viennent de DATABASES[alias]["POOL"].
+    """
+
+    def _pool(self, conn_params):
+        return get_pool(
+            self.alias,
+            lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params),
+            self.pool_ping,
+            lambda conn: conn.close(),
+            self.settings_dict.get("POOL"),
+        )
+
+    def pool_ping(self, conn):
+        """SELECT 1 sur la connexion DB-API ; un backend peut faire moins cher (MySQL : ping())."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def get_new_connection(self, conn_params):
+        return self._pool(conn_params).checkout()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = _pools.get(self.alias)
+        broken = False
+        # Transaction laissée ouverte (fermeture dans un atomic) : on annule avant de rendre
+        if self.in_atomic_block or not self.autocommit:
+            try:
+                self.connection.rollback()
+            except Exception:
+                broken = True
+        broken = broken or self.errors_occurred and not self.is_usable()
+        if pool is None:
+            with self.wrap_database_errors:
+                return self.connection.close()
+        pool.checkin(self.connection, broken=broken)
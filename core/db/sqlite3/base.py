@@ -0,0 +1,10 @@
+"""
+Backend SQLite avec le même pool que `core.db.mysql` (benchmarks, dev local).
+"""
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+
+from ..pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, SQLiteDatabaseWrapper):
+    pass
@@ -0,0 +1,158 @@
+"""
+Recalcul de Transactions.distance_km depuis les coordonnées de départ / arrivée
+(distance haversine, à vol d'oiseau) et signalement des courses suspectes.
+
+- parcours par clé (created_at, id) depuis le point de reprise, comme
+  `rollup_transactions`, par paquets de chunk_size lignes : mémoire bornée
+  quelle que soit la taille de la table ;
+- distances calculées par NumPy sur les tableaux du paquet, pas ligne par ligne ;
+- écriture : distance absente, ou plus courte que la ligne droite (impossible
+  par la route), remplacée par la distance calculée : un UPDATE ... CASE id
+  par lot de 1000, SQL construit ici (bulk_update de l'ORM : ~7x plus lent) ;
+- anomalies (RideAnomaly, une ligne par transaction et par motif, rejouable) :
+  coordonnées invalides, distance nulle, trop longue (RIDE_MAX_KM), vitesse
+  invraisemblable (RIDE_MAX_SPEED_KMH, durée = updated_at - created_at),
+  distance enregistrée plus courte que la ligne droite.
+
+Les transactions plus récentes que ROLLUP_LAG_MINUTES ne sont pas encore lues
+(arrivée pas encore renseignée) ; une date dans le futur (horloge décalée) ne
+bloque que sa propre ligne. Les transactions sans created_at sont ignorées. À lancer avant `rollup_transactions`, qui
+reprend distance_km dans les agrégats. updated_at n'est pas modifié : il sert
+de fin de course pour le calcul de vitesse.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import JobCheckpoint, RideAnomaly
+from .models_legacy import Transactions
+from .stations import EARTH_KM
+
+CHECKPOINT = "recompute_distances"
+ZERO_KM = 0.05  # départ et arrivée à moins de 50 m
+FIELDS = (
+    "id", "depart_latitude", "depart_longitude", "arrivee_latitude", "arrivee_longitude",
+    "distance_km", "created_at", "updated_at",
+)
+
+
+@dataclass
+class DistanceReport:
+    scanned: int = 0
+    updated: int = 0
+    flagged: int = 0
+    chunks: int = 0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distances (km) élément par élément entre tableaux de coordonnées en degrés."""
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _column(rows, i):
+    # None -> NaN ; Decimal -> float
+    return np.array([r[i] for r in rows], dtype=float)
+
+
+def _analyse(rows, max_km, max_speed):
+    """
+    (mises à jour {id: distance}, anomalies [(id, motif, distance, vitesse)]) pour un paquet.
+    """
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    dlat, dlon, alat, alon, stored = (_column(rows, i) for i in range(1, 6))
+    hours = np.array([
+        (r[7] - r[6]).total_seconds() / 3600 if r[6] and r[7] else np.nan for r in rows
+    ])
+
+    known = ~(np.isnan(dlat) | np.isnan(dlon) | np.isnan(alat) | np.isnan(alon))
+    valid = known & (np.abs(dlat) <= 90) & (np.abs(alat) <= 90) & (np.abs(dlon) <= 180) & (np.abs(alon) <= 180)
+    # (0, 0) : coordonnées par défaut d'un GPS non initialisé
+    valid &= ~((dlat == 0) & (dlon == 0)) & ~((alat == 0) & (alon == 0))
+    dist = np.full(len(rows), np.nan)
+    dist[valid] = haversine_km(dlat[valid], dlon[valid], alat[valid], alon[valid])
+    dist = np.round(dist, 2)
+
+    # Une route n'est jamais plus courte que la ligne droite (tolérance d'arrondi)
+    shorter = valid & ~np.isnan(stored) & (stored + 0.01 < dist)
+    write = valid & (np.isnan(stored) | shorter)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(hours > 0, dist / hours, np.nan)
+
+    flags = {
+        RideAnomaly.BAD_COORDS: known & ~valid,
+        RideAnomaly.ZERO: valid & (dist < ZERO_KM),
+        RideAnomaly.TOO_LONG: valid & (dist > max_km),
+        RideAnomaly.SPEED: valid & (speed > max_speed),
+        RideAnomaly.SHORTER: shorter,
+    }
+    updates = dict(zip(ids[write].tolist(), dist[write].tolist()))
+    anomalies = []
+    for reason, mask in flags.items():
+        for i in np.flatnonzero(mask):
+            anomalies.append((int(ids[i]), reason, _dec(dist[i], "0.01"), _dec(speed[i], "0.1")))
+    return updates, anomalies
+
+
+def _dec(value, quantum):
+    return None if np.isnan(value) else Decimal(repr(float(value))).quantize(Decimal(quantum))
+
+
+def _write_distances(updates, batch_size=1000):
+    """UPDATE transactions SET distance_km = CASE id WHEN ... END WHERE id IN (...), par lot."""
+    table = connection.ops.quote_name(Transactions._meta.db_table)
+    items = list(updates.items())
+    with connection.cursor() as cur:
+        for i in range(0, len(items), batch_size):
+            batch = items[i:i + batch_size]
+            cases = " ".join(["WHEN %s THEN %s"] * len(batch))
+            marks = ", ".join(["%s"] * len(batch))
+            params = [v for pk, km in batch for v in (pk, Decimal(repr(km)).quantize(Decimal("0.01")))]
+            cur.execute(
+                f"UPDATE {table} SET distance_km = CASE id {cases} END WHERE id IN ({marks})",
+                params + [pk for pk, _ in batch],
+            )
+
+
+def recompute_distances(chunk_size=10000, now=None, restart=False):
+    """Traite les transactions depuis le point de reprise. Renvoie un DistanceReport."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(minutes=getattr(settings, "ROLLUP_LAG_MINUTES", 120))
+    max_km = getattr(settings, "RIDE_MAX_KM", 150)
+    max_speed = getattr(settings, "RIDE_MAX_SPEED_KMH", 130)
+    if restart:
+        JobCheckpoint.objects.filter(name=CHECKPOINT).delete()
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    qs = Transactions.objects.filter(created_at__isnull=False, created_at__lt=cutoff).order_by("created_at", "id")
+    report = DistanceReport()
+    while True:
+        with transaction.atomic():
+            # Relu sous verrou à chaque paquet : deux runs ne traitent pas le même paquet
+            checkpoint = JobCheckpoint.objects.select_for_update().get(pk=checkpoint.pk)
+            page = qs
+            if checkpoint.last_created_at is not None:
+                ts, last_id = checkpoint.last_created_at, checkpoint.last_id
+                page = qs.filter(Q(created_at__gt=ts) | Q(created_at=ts, id__gt=last_id))
+            rows = list(page.values_list(*FIELDS)[:chunk_size])
+            if not rows:
+                return report
+            updates, anomalies = _analyse(rows, max_km, max_speed)
+            _write_distances(updates)
+            RideAnomaly.objects.bulk_create(
+                [RideAnomaly(transaction_id=pk, reason=reason, distance_km=km, speed_kmh=speed)
+                 for pk, reason, km, speed in anomalies],
+                batch_size=1000, ignore_conflicts=True,
+            )
+            checkpoint.last_id, checkpoint.last_created_at = rows[-1][0], rows[-1][6]
+            checkpoint.save(update_fields=["last_id", "last_created_at", "updated_at"])
+        report.scanned += len(rows)
+        report.updated += len(updates)
+        report.flagged += len(anomalies)
+        report.chunks += 1
@@ -0,0 +1,51 @@
+"""
+Clés d'idempotence des formulaires (double envoi sur réseau mobile lent).
+
+Le formulaire porte une clé aléatoire (champ caché IDEMPOTENCY_FIELD, une
+nouvelle à chaque affichage). Le premier POST avec cette clé exécute
+l'opération et mémorise son résultat en cache (TTL court) ; les renvois
+suivants reçoivent ce même résultat sans repasser par MySQL. Un renvoi qui
+arrive pendant le traitement du premier est signalé comme "en cours".
+"""
+import re
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+IDEMPOTENCY_FIELD = "idempotency_key"
+_IN_FLIGHT = "__in_flight__"
+_KEY_RE = re.compile(r"[0-9a-f]{32}")
+
+
+def new_key() -> str:
+    return uuid.uuid4().hex
+
+
+def _cache_key(scope, user_id, key):
+    return f"idem:{scope}:{user_id}:{key}"
+
+
+def run_once(scope, user_id, key, func, pending=None):
+    """
+    Exécute func() une seule fois par (scope, utilisateur, clé) et renvoie son
+    résultat (qui doit être picklable). Les appels suivants renvoient le résultat
+    mémorisé, ou `pending` si le premier est encore en cours. Si func() lève une
+    exception, rien n'est mémorisé : un renvoi pourra réessayer.
+    Sans clé valide (ancien formulaire), func() est simplement exécutée.
+    """
+    if not key or not _KEY_RE.fullmatch(key):
+        return func()
+    ttl = getattr(settings, "IDEMPOTENCY_TTL", 600)
+    ck = _cache_key(scope, user_id, key)
+    # cache.add est atomique (Redis : SET NX) : un seul des envois concurrents passe
+    if not cache.add(ck, _IN_FLIGHT, ttl):
+        outcome = cache.get(ck)
+        return pending if outcome in (None, _IN_FLIGHT) else outcome
+    try:
+        outcome = func()
+    except BaseException:
+        cache.delete(ck)
+        raise
+    cache.set(ck, outcome, ttl)
+    return outcome
@@ -0,0 +1,175 @@
+"""
+Import en masse d'enrôlements collectés hors-ligne (CSV ou JSONL).
+
+Le fichier est lu en flux par paquets de `chunk_size` lignes. Pour chaque paquet :
+- validation ligne par ligne (mêmes règles que le formulaire : build_driver / build_passenger) ;
+- unicité téléphone / immatriculation vérifiée par quelques requêtes IN (...) ;
+- insertion par bulk_create des recrues et de leurs événements d'outbox, dans
+  une transaction : commission, compteurs du BA et notification sont faits par
+  le worker `run_outbox`, comme pour le formulaire.
+
+Une ligne invalide est rapportée (numéro de ligne + motif) sans interrompre l'import.
+En JSONL, les valeurs sont converties en texte comme celles d'un CSV (téléphone
+ou coordonnées numériques).
+Colonnes attendues : type (driver|passenger), name, phone, email, zone, address,
+vehicleNumber, vehicleModel, ba_email (optionnel si un BA par défaut est donné).
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import OutboxEvent
+from .models_legacy import BrandAmbassadors, Chauffeurs, Passagers
+from .outbox import enrollment_event
+from .services import build_driver, build_passenger, get_or_create_station_for_zone
+
+DRIVER_TYPES = {"driver", "chauffeur"}
+PASSENGER_TYPES = {"passenger", "passager"}
+
+
+@dataclass
+class ImportReport:
+    drivers: int = 0
+    passengers: int = 0
+    errors: list = field(default_factory=list)  # [(ligne, message)]
+
+    @property
+    def total(self):
+        return self.drivers + self.passengers
+
+
+def read_rows(fh, fmt):
+    """Itère (numéro de ligne, dict) sur un fichier CSV ou JSONL ouvert en texte."""
+    if fmt == "csv":
+        for i, row in enumerate(csv.DictReader(fh), start=2):
+            yield i, row
+        return
+    for i, line in enumerate(fh, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield i, None
+            continue
+        if isinstance(row, dict):
+            row = {k: v if v is None else str(v) for k, v in row.items()}
+        yield i, row
+
+
+def import_enrollments(rows, default_ba_email=None, chunk_size=1000):
+    """Importe un itérable de (ligne, dict). Renvoie un ImportReport."""
+    report = ImportReport()
+    ba_ids = {}
+    stations = {}
+
+    def station_lookup(zone):
+        if zone not in stations:
+            stations[zone] = get_or_create_station_for_zone(zone)
+        return stations[zone]
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        _import_chunk(chunk, default_ba_email, ba_ids, station_lookup, report)
+    return report
+
+
+def _resolve_bas(chunk, default_ba_email, ba_ids):
+    emails = {
+        (row.get("ba_email") or default_ba_email or "").strip().lower()
+        for _, row in chunk if isinstance(row, dict)
+    } - set(ba_ids) - {""}
+    if emails:
+        ba_ids.update(BrandAmbassadors.objects.filter(email__in=emails).values_list("email", "id"))
+
+
+def _import_chunk(chunk, default_ba_email, ba_ids, station_lookup, report):
+    now = timezone.now()
+    _resolve_bas(chunk, default_ba_email, ba_ids)
+    drivers, passengers = [], []  # [(ligne, instance)]
+    for line, row in chunk:
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("Ligne illisible.")
+            email = (row.get("ba_email") or default_ba_email or "").strip().lower()
+            if email not in ba_ids:
+                raise ValueError(f"BA inconnu : {email or '—'}.")
+            kind = (row.get("type") or "").strip().lower()
+            if kind in DRIVER_TYPES:
+                drivers.append((line, build_driver(ba_ids[email], row, now, station_lookup)))
+            elif kind in PASSENGER_TYPES:
+                passengers.append((line, build_passenger(ba_ids[email], row, now)))
+            else:
+                raise ValueError("Type invalide (driver ou passenger).")
+        except ValueError as e:
+            report.errors.append((line, str(e)))
+
+    drivers = _drop_duplicates(drivers, Chauffeurs, "telephone", "Téléphone déjà utilisé.", report)
+    drivers = _drop_duplicates(
+        drivers, Chauffeurs, "vehicule_immatriculation", "Immatriculation déjà utilisée.", report
+    )
+    passengers = _drop_duplicates(passengers, Passagers, "telephone", "Téléphone passager déjà utilisé.", report)
+
+    report.drivers += len(_insert(drivers, Chauffeurs, report))
+    report.passengers += len(_insert(passengers, Passagers, report))
+
+
+def _drop_duplicates(items, model, field_name, message, report):
+    """Écarte les doublons (dans le paquet et en base) avec une seule requête IN."""
+    values = [getattr(obj, field_name) for _, obj in items]
+    taken = set(model.objects.filter(**{f"{field_name}__in": values}).values_list(field_name, flat=True))
+    kept = []
+    for line, obj in items:
+        value = getattr(obj, field_name)
+        if value in taken:
+            report.errors.append((line, message))
+            continue
+        taken.add(value)
+        kept.append((line, obj))
+    return kept
+
+
+def _insert(items, model, report):
+    """
+    bulk_create des recrues + événements d'outbox. En cas de conflit concurrent
+    (IntegrityError), on retombe sur une insertion ligne par ligne pour ce paquet.
+    """
+    if not items:
+        return []
+    objs = [obj for _, obj in items]
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(objs)
+            _assign_ids(model, objs)
+            OutboxEvent.objects.bulk_create([enrollment_event(o) for o in objs])
+        return objs
+    except IntegrityError:
+        pass
+    created = []
+    for line, obj in items:
+        obj.pk = None
+        try:
+            with transaction.atomic():
+                obj.save(force_insert=True)
+                enrollment_event(obj).save(force_insert=True)
+            created.append(obj)
+        except IntegrityError:
+            report.errors.append((line, "Téléphone ou immatriculation déjà utilisés."))
+    return created
+
+
+def _assign_ids(model, objs):
+    # MySQL ne renvoie pas les clés créées par bulk_create : on les relit par téléphone
+    if all(o.pk for o in objs):
+        return
+    ids = dict(model.objects.filter(telephone__in=[o.telephone for o in objs]).values_list("telephone", "id"))
+    for o in objs:
+        o.pk = ids[o.telephone]
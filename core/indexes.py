@@ -0,0 +1,117 @@
+"""
+Index requis par les services sur les tables legacy (managed = False : Django
+ne les crée pas, cf. `manage.py check_indexes`).
+
+- REQUIRED_INDEXES : index composites attendus par les requêtes chaudes ;
+- missing_indexes() compare avec le schéma réel (un index existant dont les
+  premières colonnes sont celles attendues suffit) ;
+- full_scans() passe une requête SQL dans EXPLAIN et renvoie les tables lues
+  en entier ; explain_hot_paths() le fait pour les requêtes du dashboard.
+"""
+import re
+
+from django.db import connection, models
+from django.test.utils import CaptureQueriesContext
+
+from .models_legacy import Challenges, Chauffeurs, Commissions, Passagers, Transactions
+
+REQUIRED_INDEXES = [
+    (Chauffeurs, models.Index(fields=["ba", "created_at"], name="idx_chauffeurs_ba_created")),
+    (Passagers, models.Index(fields=["ba", "created_at"], name="idx_passagers_ba_created")),
+    (Commissions, models.Index(fields=["ba", "created_at"], name="idx_commissions_ba_created")),
+    (Commissions, models.Index(fields=["ba", "statut"], name="idx_commissions_ba_statut")),
+    (Challenges, models.Index(fields=["actif", "date_debut", "date_fin"], name="idx_challenges_actif_dates")),
+    # Parcours incrémental (created_at, id) de core.rollups ; InnoDB ajoute l'id à l'index
+    (Transactions, models.Index(fields=["created_at"], name="idx_transactions_created")),
+]
+
+
+def _columns(model, index):
+    return [model._meta.get_field(f).column for f in index.fields]
+
+
+def existing_indexes(model):
+    """{nom: [colonnes]} des index (et clés) présents sur la table du modèle."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    return {
+        name: c["columns"]
+        for name, c in constraints.items()
+        if c["index"] or c["unique"] or c["primary_key"]
+    }
+
+
+def index_status():
+    """[(modèle, index, nom de l'index existant qui le couvre ou None)]."""
+    tables = set(connection.introspection.table_names())
+    out = []
+    for model, index in REQUIRED_INDEXES:
+        if model._meta.db_table not in tables:
+            continue
+        wanted = _columns(model, index)
+        found = next(
+            (name for name, cols in existing_indexes(model).items() if cols[: len(wanted)] == wanted),
+            None,
+        )
+        out.append((model, index, found))
+    return out
+
+
+def missing_indexes():
+    return [(model, index) for model, index, found in index_status() if found is None]
+
+
+def create_index_sql(model, index):
+    with connection.schema_editor(collect_sql=True) as editor:
+        return str(index.create_sql(model, editor))
+
+
+def apply_missing_indexes():
+    """Crée les index manquants (CREATE INDEX, en ligne sous InnoDB). Renvoie ceux créés."""
+    missing = missing_indexes()
+    with connection.schema_editor() as editor:
+        for model, index in missing:
+            editor.add_index(model, index)
+    return missing
+
+
+def drop_indexes(names):
+    for model, index in REQUIRED_INDEXES:
+        if index.name in names and index.name in existing_indexes(model):
+            with connection.schema_editor() as editor:
+                editor.remove_index(model, index)
+
+
+def full_scans(sql):
+    """Tables lues en entier (sans index) par la requête, d'après EXPLAIN."""
+    tables = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            found = [m.group(1) for m in (re.match(r"SCAN (\w+)", row[-1]) for row in cursor.fetchall()) if m]
+        else:
+            # MySQL : type = ALL -> parcours complet de la table
+            cursor.execute("EXPLAIN " + sql)
+            cols = [c[0].lower() for c in cursor.description]
+            found = [r["table"] for r in (dict(zip(cols, row)) for row in cursor.fetchall()) if r.get("type") == "ALL"]
+    # Sous-requêtes : l'alias Django (U0, T3...) apparaît à la place de la table
+    return sorted({t for t in found if t in tables or re.fullmatch(r"[A-Z]\d+", t or "")})
+
+
+def explain_hot_paths(ba_id):
+    """
+    Exécute les requêtes chaudes (fil des recrues, stats du dashboard, challenges,
+    liste des commissions de l'API) pour ce BA et renvoie [(sql, tables scannées)].
+    """
+    from .challenges import compute_progress, get_active_challenges
+    from .counters import month_start
+    from .services import _ba_stats_row, get_recruits_page
+
+    with CaptureQueriesContext(connection) as ctx:
+        get_recruits_page(ba_id)
+        _ba_stats_row(ba_id, month_start())
+        challenges = get_active_challenges()
+        if challenges:
+            compute_progress(challenges, [ba_id])
+        list(Commissions.objects.filter(ba_id=ba_id).order_by("-created_at", "-id")[:20])
+    return [(q["sql"], full_scans(q["sql"])) for q in ctx.captured_queries]
@@ -0,0 +1,114 @@
+"""
+Classement des BA par commissions du mois puis nombre de recrues du mois.
+
+Le calcul (un GROUP BY sur les commissions du mois) est fait périodiquement par
+`manage.py rebuild_leaderboard` : il écrit brand_ambassadors.rang et un snapshot
+compact du top N (table LeaderboardEntry + cache). Servir le top N ou le rang
+d'un BA ne coûte donc plus aucun agrégat par page vue.
+
+Le rebuild tourne dans son propre process : avec un cache LocMem, les workers
+web ne voient pas son écriture. Le top en cache expire donc après
+LEADERBOARD_CACHE_TTL et est relu depuis la table snapshot.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .cache import bump_ba_revisions, invalidate_ba_caches
+from .counters import month_start
+from .models import LeaderboardEntry
+from .models_legacy import BrandAmbassadors, Commissions
+
+LEADERBOARD_CACHE_KEY = "leaderboard:top"
+LEADERBOARD_SIZE = 100
+
+
+def _ttl():
+    return getattr(settings, "LEADERBOARD_CACHE_TTL", 300)
+
+
+def compute_rankings(now=None):
+    """
+    Renvoie la liste triée de tous les BA :
+    (ba_id, nom complet, chauffeurs, recrues, commission, rang actuel).
+    """
+    since = month_start(now)
+    stats = {
+        r["ba_id"]: r
+        for r in Commissions.objects.filter(created_at__gte=since).order_by().values("ba_id").annotate(
+            commission=Sum("montant"),
+            recruits=Count("id"),
+            drivers=Count("id", filter=Q(recrue_type="CHAUFFEUR")),
+        )
+    }
+    rows = []
+    for ba_id, prenom, nom, rang in BrandAmbassadors.objects.values_list("id", "prenom", "nom", "rang").iterator():
+        s = stats.get(ba_id, {})
+        rows.append((
+            ba_id,
+            f"{prenom} {nom}".strip(),
+            s.get("drivers", 0),
+            s.get("recruits", 0),
+            s.get("commission") or Decimal(0),
+            rang,
+        ))
+    # Commission desc, recrues desc, puis id (ancienneté) pour départager
+    rows.sort(key=lambda r: (-r[4], -r[3], r[0]))
+    return rows
+
+
+def rebuild_leaderboard(batch_size=1000, now=None):
+    """
+    Recalcule le classement, met à jour `rang` (uniquement les lignes qui changent)
+    et remplace le snapshot du top N. Renvoie (nb de BA classés, nb de rangs modifiés).
+    """
+    now = now or timezone.now()
+    rows = compute_rankings(now)
+    changed = [
+        BrandAmbassadors(id=ba_id, rang=rank)
+        for rank, (ba_id, _, _, _, _, old_rank) in enumerate(rows, start=1)
+        if old_rank != rank
+    ]
+    top = [
+        LeaderboardEntry(
+            rank=rank, ba_id=ba_id, name=name, drivers=drivers,
+            recruits=recruits, commission=commission, computed_at=now,
+        )
+        for rank, (ba_id, name, drivers, recruits, commission, _) in enumerate(rows[:LEADERBOARD_SIZE], start=1)
+    ]
+    with transaction.atomic():
+        BrandAmbassadors.objects.bulk_update(changed, ["rang"], batch_size=batch_size)
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(top)
+    changed_ids = [b.id for b in changed]
+    # Le rang est affiché dans le dashboard et gardé dans le snapshot de session
+    bump_ba_revisions(changed_ids)
+    invalidate_ba_caches(changed_ids)
+    cache.set(LEADERBOARD_CACHE_KEY, [_entry_dict(e) for e in top], _ttl())
+    return len(rows), len(changed)
+
+
+def _entry_dict(e):
+    return {
+        "rank": e.rank,
+        "ba_id": e.ba_id,
+        "name": e.name,
+        "drivers": e.drivers,
+        "recruits": e.recruits,
+        "commission": float(e.commission),
+    }
+
+
+def get_top(limit=20):
+    """Top N depuis le cache, ou depuis la table snapshot (une requête indexée)."""
+    top = cache.get(LEADERBOARD_CACHE_KEY)
+    if top is None:
+        top = [_entry_dict(e) for e in LeaderboardEntry.objects.all()[:LEADERBOARD_SIZE]]
+        # Snapshot vide : aucun rebuild encore fait, on relira la table à la prochaine page
+        if top:
+            cache.set(LEADERBOARD_CACHE_KEY, top, _ttl())
+    return top[:limit]
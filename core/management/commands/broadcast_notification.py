@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.notifications import broadcast
+
+
+class Command(BaseCommand):
+    help = "Envoie une notification à tous les BA actifs (ou à --ba), par paquets (bulk_create)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("titre")
+        parser.add_argument("message")
+        parser.add_argument("--type", default="ANNONCE")
+        parser.add_argument("--ba", type=int, action="append", help="id du BA (répétable).")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+        n = broadcast(opts["titre"], opts["message"], type=opts["type"], ba_ids=opts["ba"],
+                      chunk_size=opts["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{n} notification(s) envoyée(s) en {time.perf_counter() - t0:.2f}s."
+        ))
@@ -0,0 +1,37 @@
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+CORE = Path(__file__).resolve().parents[2]
+SOURCE = CORE / "assets" / "app.css"
+OUTPUT = CORE / "static" / "core" / "app.css"
+
+
+class Command(BaseCommand):
+    help = (
+        "Régénère core/static/core/app.css (Tailwind, classes des templates uniquement, "
+        "minifié) avec le CLI autonome `tailwindcss` (pip install -r requirements-build.txt). "
+        "Le fichier généré est versionné ; collectstatic le compresse et le versionne."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--binary", default="tailwindcss", help="Chemin du CLI tailwindcss.")
+
+    def handle(self, *args, **opts):
+        binary = shutil.which(opts["binary"])
+        if binary is None:
+            raise CommandError(f"{opts['binary']} introuvable : pip install -r requirements-build.txt")
+        t0 = time.perf_counter()
+        result = subprocess.run(
+            [binary, "-i", str(SOURCE), "-o", str(OUTPUT), "--minify"],
+            capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip())
+        self.stdout.write(self.style.SUCCESS(
+            f"{OUTPUT.relative_to(CORE.parent)} : {OUTPUT.stat().st_size / 1024:.1f} Ko "
+            f"en {time.perf_counter() - t0:.1f}s."
+        ))
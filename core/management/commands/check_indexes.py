@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.indexes import apply_missing_indexes, create_index_sql, explain_hot_paths, index_status
+from core.models_legacy import BrandAmbassadors
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les index des tables legacy avec ceux requis par les services ; "
+        "affiche le SQL des index manquants ou les crée (--apply)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--apply", action="store_true", help="Créer les index manquants.")
+        parser.add_argument("--explain", action="store_true",
+                            help="Passer les requêtes chaudes dans EXPLAIN (échoue si une table est lue en entier).")
+        parser.add_argument("--ba", type=int, help="BA utilisé pour --explain (le premier par défaut).")
+
+    def handle(self, *args, **opts):
+        missing = []
+        for model, index, found in index_status():
+            table = model._meta.db_table
+            if found:
+                self.stdout.write(f"OK       {table} {index.name} (couvert par {found})")
+            else:
+                missing.append((model, index))
+                self.stdout.write(self.style.WARNING(f"MANQUANT {table} {index.name}"))
+                self.stdout.write(f"  {create_index_sql(model, index)};")
+        if missing and opts["apply"]:
+            for model, index in apply_missing_indexes():
+                self.stdout.write(self.style.SUCCESS(f"Créé : {model._meta.db_table} {index.name}"))
+
+        if opts["explain"]:
+            ba_id = opts["ba"] or BrandAmbassadors.objects.order_by("id").values_list("id", flat=True).first()
+            if ba_id is None:
+                raise CommandError("Aucun BA en base pour --explain.")
+            scanned = [(sql, tables) for sql, tables in explain_hot_paths(ba_id) if tables]
+            for sql, tables in scanned:
+                self.stderr.write(f"Parcours complet de {', '.join(tables)} :\n  {sql}")
+            if scanned:
+                raise CommandError(f"{len(scanned)} requête(s) chaude(s) sans index.")
+            self.stdout.write(self.style.SUCCESS("Requêtes chaudes : aucun parcours complet."))
@@ -0,0 +1,47 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import import_enrollments, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe en masse des enrôlements chauffeurs / passagers depuis un fichier CSV ou JSONL. "
+        "Commissions, compteurs et notifications sont créés ensuite par `run_outbox`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Fichier .csv ou .jsonl")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Déduit de l'extension par défaut.")
+        parser.add_argument("--ba-email", help="BA par défaut si la colonne ba_email est absente.")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--errors", help="Écrire les lignes en erreur dans ce fichier CSV.")
+
+    def handle(self, *args, **opts):
+        path = opts["path"]
+        fmt = opts["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        t0 = time.perf_counter()
+        try:
+            fh = open(path, newline="", encoding="utf-8-sig")
+        except OSError as e:
+            raise CommandError(str(e))
+        with fh:
+            report = import_enrollments(read_rows(fh, fmt), opts["ba_email"], opts["chunk_size"])
+        elapsed = time.perf_counter() - t0
+        if opts["errors"]:
+            with open(opts["errors"], "w", newline="", encoding="utf-8") as out:
+                writer = csv.writer(out)
+                writer.writerow(["ligne", "erreur"])
+                writer.writerows(report.errors)
+        else:
+            for line, message in report.errors:
+                self.stderr.write(f"ligne {line}: {message}")
+        rate = report.total / elapsed * 60 if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.drivers} chauffeur(s), {report.passengers} passager(s) importés, "
+            f"{len(report.errors)} erreur(s) en {elapsed:.1f}s ({rate:.0f} lignes/min)."
+        ))
+        if report.errors and not report.total:
+            raise CommandError("Aucune ligne importée.")
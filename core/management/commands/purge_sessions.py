@@ -0,0 +1,39 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime les sessions expirées par lots (remplace `clearsessions`, "
+        "qui fait un seul gros DELETE sur django_session)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0.0,
+                            help="Pause (secondes) entre deux lots, pour laisser respirer MySQL.")
+
+    def handle(self, *args, **opts):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not hasattr(store, "get_model_class"):
+            # signed_cookies : rien n'est stocké côté serveur
+            self.stdout.write("Moteur de session sans table : rien à purger.")
+            return
+        model = store.get_model_class()
+        now = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=now)
+                .values_list("pk", flat=True)[: opts["batch_size"]]
+            )
+            if not keys:
+                break
+            deleted += model.objects.filter(pk__in=keys).delete()[0]
+            if opts["sleep"]:
+                time.sleep(opts["sleep"])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} session(s) expirée(s) supprimée(s)."))
@@ -0,0 +1,35 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.stations import reassign_drivers
+
+
+class Command(BaseCommand):
+    help = (
+        "Rattache chaque chauffeur à la station active la plus proche de la majorité "
+        "de ses points de départ (index spatial en mémoire), par paquets de chauffeurs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=90, help="Courses des N derniers jours (0 = toutes).")
+        parser.add_argument("--min-rides", type=int, default=3)
+        parser.add_argument("--max-km", type=float, default=None,
+                            help="Distance max départ -> station (défaut : STATIONS_MAX_KM).")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Compter sans modifier.")
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+        since = timezone.now() - timedelta(days=opts["days"]) if opts["days"] else None
+        report = reassign_drivers(
+            since=since, min_rides=opts["min_rides"], max_km=opts["max_km"],
+            chunk_size=opts["chunk_size"], dry_run=opts["dry_run"],
+        )
+        verb = "à déplacer" if opts["dry_run"] else "déplacé(s)"
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.drivers} chauffeur(s), {report.rides} départ(s) lus, {report.moved} {verb} "
+            f"en {time.perf_counter() - t0:.2f}s."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import rebuild_ba_counters
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs matérialisés de brand_ambassadors (réconciliation)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ba", type=int, action="append", dest="ba_ids",
+                            help="Limiter à ce(s) BA (répétable).")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        n = rebuild_ba_counters(opts["ba_ids"], batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{n} BA réconcilié(s)."))
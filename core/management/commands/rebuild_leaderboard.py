@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = "Recalcule le classement des BA (rang + snapshot du top). À lancer périodiquement (cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+        total, changed = rebuild_leaderboard(batch_size=opts["batch_size"])
+        elapsed = time.perf_counter() - t0
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} BA classés, {changed} rang(s) modifié(s) en {elapsed:.2f}s."
+        ))
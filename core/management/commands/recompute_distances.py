@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.distances import recompute_distances
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcule transactions.distance_km (haversine départ -> arrivée) quand elle manque "
+        "ou est incohérente, et signale les courses suspectes (RideAnomaly). Incrémental "
+        "(point de reprise) ; à lancer avant rollup_transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=10000)
+        parser.add_argument("--restart", action="store_true",
+                            help="Repartir du début de la table (historique complet).")
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+        report = recompute_distances(chunk_size=opts["chunk_size"], restart=opts["restart"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.scanned} transaction(s) lue(s) ({report.chunks} paquet(s)) : {report.updated} "
+            f"distance(s) écrite(s), {report.flagged} anomalie(s) en {time.perf_counter() - t0:.1f}s."
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.rollups import rollup_transactions
+
+
+class Command(BaseCommand):
+    help = (
+        "Agrège les nouvelles transactions (depuis le dernier run) par jour et par "
+        "chauffeur / passager / station, et met à jour total_courses, courses_mois et "
+        "montant_total_depense. À lancer périodiquement (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--rebuild", action="store_true",
+                            help="Vider les agrégats et tout recalculer depuis le début.")
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+        report = rollup_transactions(chunk_size=opts["chunk_size"], rebuild=opts["rebuild"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.rides} course(s) agrégée(s) sur {report.scanned} transaction(s) lue(s) "
+            f"({report.chunks} paquet(s)) ; {report.drivers} chauffeur(s), {report.passengers} "
+            f"passager(s) mis à jour en {time.perf_counter() - t0:.1f}s."
+        ))
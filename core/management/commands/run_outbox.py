@@ -0,0 +1,56 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from core.cache import cache_is_shared
+from core.outbox import drain, pending_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de l'outbox des enrôlements : crée les commissions, met à jour les "
+        "compteurs BA et envoie les notifications, par paquets. Tourne en continu "
+        "(un ou plusieurs process, sans broker) ; --once vide la file puis s'arrête."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--interval", type=float, default=1.0,
+                            help="Pause (secondes) quand la file est vide.")
+        parser.add_argument("--once", action="store_true", help="Vider la file puis s'arrêter.")
+        parser.add_argument("--local-cache", action="store_true",
+                            help="Accepter un cache non partagé (dev) : les workers web ne "
+                                 "verront pas les invalidations.")
+
+    def handle(self, *args, **opts):
+        # Les invalidations (dashboard, non lues) sont faites ici, hors des workers web
+        if not cache_is_shared() and not opts["local_cache"]:
+            raise CommandError(
+                "run_outbox exige un cache partagé avec les workers web (REDIS_URL) ; "
+                "--local-cache pour passer outre en dev."
+            )
+        self._stop = False
+        # Arrêt propre (systemd / supervisor) : on termine le paquet en cours
+        signal.signal(signal.SIGTERM, self._request_stop)
+        total = 0
+        try:
+            while not self._stop:
+                close_old_connections()
+                done = drain(opts["batch_size"], max_batches=1)
+                total += done
+                if done and opts["verbosity"] >= 2:
+                    self.stdout.write(f"{done} événement(s) traité(s).")
+                if not done:
+                    if opts["once"]:
+                        break
+                    time.sleep(opts["interval"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} événement(s) traité(s), {pending_events().count()} en attente."
+        ))
+
+    def _request_stop(self, signum, frame):
+        self._stop = True
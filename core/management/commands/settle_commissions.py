@@ -0,0 +1,45 @@
+import time
+from datetime import datetime, time as dt_time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.settlement import pay_commissions, validate_commissions
+
+
+class Command(BaseCommand):
+    help = (
+        "Valide les commissions en attente dont la recrue est active, et paie "
+        "les commissions validées (--pay). Rejouable, reprend après interruption."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--restart", action="store_true",
+                            help="Ignorer le point de reprise et repartir du début.")
+        parser.add_argument("--pay", action="store_true",
+                            help="Passer aussi PAID les commissions validées.")
+        parser.add_argument("--validated-before", metavar="YYYY-MM-DD",
+                            help="Avec --pay : seulement les commissions validées avant cette date.")
+
+    def handle(self, *args, **opts):
+        before = None
+        if opts["validated_before"]:
+            try:
+                day = datetime.strptime(opts["validated_before"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--validated-before attend une date YYYY-MM-DD")
+            before = timezone.make_aware(datetime.combine(day, dt_time.min))
+
+        t0 = time.perf_counter()
+        report = validate_commissions(chunk_size=opts["chunk_size"], restart=opts["restart"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.validated} commission(s) validée(s) sur {report.scanned} en attente "
+            f"({report.chunks} paquet(s), {time.perf_counter() - t0:.1f}s)."
+        ))
+        if opts["pay"]:
+            t0 = time.perf_counter()
+            report = pay_commissions(before, chunk_size=opts["chunk_size"])
+            self.stdout.write(self.style.SUCCESS(
+                f"{report.paid} commission(s) payée(s) ({time.perf_counter() - t0:.1f}s)."
+            ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.challenges import sync_participations
+
+
+class Command(BaseCommand):
+    help = "Recalcule participations_challenges (progression / completed) pour les challenges actifs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ba", type=int, action="append", dest="ba_ids",
+                            help="Limiter à ce(s) BA (répétable).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        created, updated = sync_participations(opts["ba_ids"], batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{created} participation(s) créée(s), {updated} mise(s) à jour."
+        ))
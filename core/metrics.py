@@ -0,0 +1,247 @@
+"""
+Instrumentation des requêtes HTTP (cf. InstrumentationMiddleware).
+
+Par requête : nombre de requêtes SQL, temps DB cumulé, requête la plus lente et
+temps de rendu des templates. Les mesures partent dans l'en-tête Server-Timing,
+dans les compteurs Prometheus du worker (vue `metrics`) et sont comparées aux
+budgets VIEW_BUDGETS de la vue.
+
+Les requêtes SQL sont comptées par un execute_wrapper posé sur chaque connexion ;
+la requête courante est portée par une ContextVar, donc les threads lancés par
+sync_to_async (vue async) sont comptés aussi.
+"""
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+_current = ContextVar("request_stats", default=None)
+
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class BudgetExceeded(Exception):
+    """Levée par le middleware quand VIEW_BUDGETS_STRICT est actif (tests / CI)."""
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest = (0.0, "")
+        self.template_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_query(self, sql, seconds):
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            if seconds > self.slowest[0]:
+                self.slowest = (seconds, sql)
+
+    def add_template(self, seconds):
+        with self._lock:
+            self.template_seconds += seconds
+
+    def server_timing(self, total):
+        return ", ".join([
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} requêtes"',
+            f"db-slowest;dur={self.slowest[0] * 1000:.1f}",
+            f"tpl;dur={self.template_seconds * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ])
+
+
+def start_request():
+    """Ouvre la mesure de la requête courante ; renvoie (stats, jeton de la ContextVar)."""
+    for conn in connections.all():
+        _install(conn)
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - started)
+
+
+def _install(conn):
+    if _record_query not in conn.execute_wrappers:
+        conn.execute_wrappers.append(_record_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    # Connexions ouvertes dans d'autres threads (sync_to_async, pool)
+    _install(connection)
+
+
+connection_created.connect(_on_connection_created)
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            if stats is not None:
+                stats.add_template(time.perf_counter() - started)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Backend DjangoTemplates qui chronomètre le rendu (includes compris)."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+# --- Budgets par vue -------------------------------------------------------------
+
+# Requêtes SQL max par vue pour un BA connecté (session et utilisateur en cache,
+# cf. prime_on_login), compteurs initialisés, caches de données vides :
+#   - ba_app : 6, la cible ; 3 mesurées (non lues, stats, challenges), la marge
+#     couvre la relecture du BA (instantané de session expiré) et le snapshot
+#     du classement ;
+#   - ba_app_tab : 4, un seul onglet (2 mesurées au plus) ;
+#   - enroll_driver : 6, l'écriture seule — station, doublons, INSERT,
+#     événement outbox, SAVEPOINT/RELEASE de transaction.atomic() ;
+#     enroll_passenger : 5, sans la station ;
+#   - api-* : 4, la page (pagination par clé, pas de COUNT) ; en auth Basic,
+#     sans session : l'utilisateur, son profil BA et le BA.
+# Contrôlés par ViewBudgetTests ; surchargeable via settings.VIEW_BUDGETS.
+DEFAULT_VIEW_BUDGETS = {
+    "ba_app": 6,
+    "ba_app_async": 6,
+    "ba_app_tab": 4,
+    "enroll_driver": 6,
+    "enroll_passenger": 5,
+    "api-drivers-list": 4,
+    "api-passengers-list": 4,
+    "api-commissions-list": 4,
+    "api-notifications-list": 4,
+}
+
+
+def view_budget(view):
+    """Budget déclaré pour la vue : {"queries": n, "db_ms": x} (un entier = requêtes)."""
+    budget = getattr(settings, "VIEW_BUDGETS", DEFAULT_VIEW_BUDGETS).get(view)
+    if isinstance(budget, int):
+        return {"queries": budget}
+    return budget or {}
+
+
+def check_budget(view, stats):
+    """Liste des dépassements du budget de la vue (vide si dans les clous)."""
+    budget = view_budget(view)
+    over = []
+    if "queries" in budget and stats.queries > budget["queries"]:
+        over.append(f"{stats.queries} requêtes SQL > {budget['queries']}")
+    if "db_ms" in budget and stats.db_seconds * 1000 > budget["db_ms"]:
+        over.append(f"{stats.db_seconds * 1000:.1f} ms DB > {budget['db_ms']} ms")
+    return over
+
+
+# --- Compteurs Prometheus (par worker) ----------------------------------------
+
+_lock = threading.Lock()
+_views = {}
+
+
+def observe(view, stats, total, over_budget):
+    with _lock:
+        m = _views.setdefault(view, {
+            "requests": 0, "seconds": 0.0, "buckets": [0] * len(DURATION_BUCKETS),
+            "queries": 0, "db_seconds": 0.0, "template_seconds": 0.0, "over_budget": 0,
+        })
+        m["requests"] += 1
+        m["seconds"] += total
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if total <= bound:
+                m["buckets"][i] += 1
+        m["queries"] += stats.queries
+        m["db_seconds"] += stats.db_seconds
+        m["template_seconds"] += stats.template_seconds
+        m["over_budget"] += bool(over_budget)
+
+
+def render_prometheus():
+    """Compteurs du worker au format texte Prometheus (label `worker` = pid)."""
+    from .db.pool import pool_stats
+
+    worker = os.getpid()
+    with _lock:
+        views = sorted((name, dict(m, buckets=list(m["buckets"]))) for name, m in _views.items())
+    lines = []
+
+    def sample(name, labels, value):
+        label_str = ",".join(f'{k}="{v}"' for k, v in {**labels, "worker": worker}.items())
+        lines.append(f"{name}{{{label_str}}} {value}")
+
+    def header(name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    name = "taxiconnect_request_duration_seconds"
+    header(name, "histogram", "Durée des requêtes HTTP par vue.")
+    for view, m in views:
+        for bound, count in zip(DURATION_BUCKETS, m["buckets"]):
+            sample(f"{name}_bucket", {"view": view, "le": bound}, count)
+        sample(f"{name}_bucket", {"view": view, "le": "+Inf"}, m["requests"])
+        sample(f"{name}_sum", {"view": view}, m["seconds"])
+        sample(f"{name}_count", {"view": view}, m["requests"])
+
+    for key, name, help_text in (
+        ("queries", "taxiconnect_db_queries_total", "Requêtes SQL exécutées par vue."),
+        ("db_seconds", "taxiconnect_db_seconds_total", "Temps passé en base par vue."),
+        ("template_seconds", "taxiconnect_template_seconds_total", "Temps de rendu des templates par vue."),
+        ("over_budget", "taxiconnect_budget_exceeded_total", "Requêtes au-delà du budget de la vue."),
+    ):
+        header(name, "counter", help_text)
+        for view, m in views:
+            sample(name, {"view": view}, m[key])
+
+    # Pool de connexions (DB_POOL=1, cf. core.db.pool)
+    pools = sorted(pool_stats().items())
+    for key, name, kind, help_text, scale in (
+        ("open", "taxiconnect_db_pool_open", "gauge", "Connexions ouvertes du pool.", 1),
+        ("idle", "taxiconnect_db_pool_idle", "gauge", "Connexions au repos dans le pool.", 1),
+        ("checkouts", "taxiconnect_db_pool_checkouts_total", "counter", "Emprunts de connexion.", 1),
+        ("timeouts", "taxiconnect_db_pool_timeouts_total", "counter", "Emprunts abandonnés (pool saturé).", 1),
+        ("wait_total_ms", "taxiconnect_db_pool_wait_seconds_total", "counter", "Attente cumulée au checkout.", 0.001),
+    ):
+        if pools:
+            header(name, kind, help_text)
+        for alias, stats in pools:
+            sample(name, {"alias": alias}, stats[key] * scale)
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    with _lock:
+        _views.clear()
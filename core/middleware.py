@@ -0,0 +1,88 @@
+import logging
+import time
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .metrics import BudgetExceeded, check_budget, end_request, observe, start_request
+from .services import BA_SESSION_KEY, ba_from_snapshot, ba_snapshot, get_ba_from_user
+
+logger = logging.getLogger(__name__)
+
+
+def _get_request_ba(request):
+    if not request.user.is_authenticated:
+        return None
+    return get_ba_from_user(request.user)
+
+
+class BrandAmbassadorMiddleware:
+    """
+    Attache `request.ba` (BA MySQL de l'utilisateur connecté, résolu à la demande).
+    Le BA est mémorisé en session : les requêtes suivantes n'interrogent plus
+    brand_ambassadors tant que la ligne n'a pas changé.
+    À placer après AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.ba = SimpleLazyObject(lambda: _get_request_ba(request))
+        response = self.get_response(request)
+        self._remember(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        user = request.user
+        if user.is_authenticated and getattr(user, "_ba_cache", None) is None:
+            ba = ba_from_snapshot(user, request.session.get(BA_SESSION_KEY))
+            if ba is not None:
+                user._ba_cache = ba
+
+    def _remember(self, request):
+        # Après logout, request.user est anonyme : rien à mémoriser
+        user = getattr(request, "user", None)
+        ba = getattr(user, "_ba_cache", None)
+        if ba is None or not user.is_authenticated:
+            return
+        # Client sans session (API en Basic) : on ne crée pas de session pour elle
+        if request.session.session_key is None:
+            return
+        current = request.session.get(BA_SESSION_KEY)
+        if ba_from_snapshot(user, current) is None:
+            request.session[BA_SESSION_KEY] = ba_snapshot(user, ba)
+
+
+class InstrumentationMiddleware:
+    """
+    Mesure chaque requête (requêtes SQL, temps DB, requête la plus lente, rendu
+    des templates, cf. core.metrics), ajoute l'en-tête Server-Timing, alimente
+    les compteurs Prometheus et vérifie le budget VIEW_BUDGETS de la vue.
+    À placer en tête de MIDDLEWARE pour compter aussi session et authentification.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        total = time.perf_counter() - stats.started
+        match = getattr(request, "resolver_match", None)
+        view = (match.url_name or match.func.__name__) if match else "unmatched"
+        if view == "metrics":
+            return response
+        if getattr(settings, "SERVER_TIMING", True):
+            response["Server-Timing"] = stats.server_timing(total)
+        over = check_budget(view, stats)
+        observe(view, stats, total, over_budget=bool(over))
+        if over:
+            message = f"Budget dépassé pour {view} : {', '.join(over)} (plus lente : {stats.slowest[1][:200]})"
+            if getattr(settings, "VIEW_BUDGETS_STRICT", False):
+                raise BudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -1,10 +1,15 @@
 from django.db import migrations, connection
 def forwards(apps, schema_editor):
+    # Base de test / base vierge : la table legacy n'existe pas, rien à faire
+    if connection.vendor != "mysql" or "chauffeurs" not in connection.introspection.table_names():
+        return
     with connection.cursor() as cursor:
         cursor.execute("SHOW COLUMNS FROM chauffeurs LIKE 'adresse';")
         if cursor.fetchone() is None:
             cursor.execute("ALTER TABLE chauffeurs ADD COLUMN adresse VARCHAR(255) NULL;")
 def backwards(apps, schema_editor):
+    if connection.vendor != "mysql" or "chauffeurs" not in connection.introspection.table_names():
+        return
     with connection.cursor() as cursor:
         cursor.execute("SHOW COLUMNS FROM chauffeurs LIKE 'adresse';")
         if cursor.fetchone() is not None:
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_add_chauffeurs_adresse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField(unique=True)),
+                ('ba_id', models.BigIntegerField()),
+                ('name', models.CharField(max_length=201)),
+                ('drivers', models.PositiveIntegerField(default=0)),
+                ('recruits', models.PositiveIntegerField(default=0)),
+                ('commission', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, connection
+
+# Index des tables legacy. Les modèles sont managed = False : AddIndex n'aurait
+# aucun effet, on écrit le DDL. Liste figée ici (et non lue dans core/indexes.py)
+# pour que la migration reste la même quand REQUIRED_INDEXES évolue.
+INDEXES = [
+    ("chauffeurs", "idx_chauffeurs_ba_created", ["ba_id", "created_at"]),
+    ("passagers", "idx_passagers_ba_created", ["ba_id", "created_at"]),
+    ("commissions", "idx_commissions_ba_created", ["ba_id", "created_at"]),
+    ("commissions", "idx_commissions_ba_statut", ["ba_id", "statut"]),
+    ("challenges", "idx_challenges_actif_dates", ["actif", "date_debut", "date_fin"]),
+]
+
+
+def _existing(cursor, table):
+    constraints = connection.introspection.get_constraints(cursor, table)
+    return {name: c["columns"] for name, c in constraints.items() if c["index"] or c["unique"] or c["primary_key"]}
+
+
+def forwards(apps, schema_editor):
+    # Base de test / base vierge : les tables legacy n'existent pas, rien à faire
+    if connection.vendor != "mysql" or "chauffeurs" not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        for table, name, columns in INDEXES:
+            # Un index existant qui commence par les mêmes colonnes suffit
+            if any(cols[: len(columns)] == columns for cols in _existing(cursor, table).values()):
+                continue
+            cursor.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)});")
+
+
+def backwards(apps, schema_editor):
+    if connection.vendor != "mysql" or "chauffeurs" not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        for table, name, _ in INDEXES:
+            if name in _existing(cursor, table):
+                cursor.execute(f"DROP INDEX {name} ON {table};")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0005_jobcheckpoint"),
+    ]
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
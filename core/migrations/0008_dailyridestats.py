@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRideStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=10)),
+                ('key_id', models.BigIntegerField()),
+                ('day', models.DateField()),
+                ('rides', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('commission', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('distance_km', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', 'day'], name='idx_ride_stats_day')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyridestats',
+            constraint=models.UniqueConstraint(fields=('dimension', 'key_id', 'day'), name='uniq_ride_stats'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, connection
+
+# Index (created_at) sur transactions pour le parcours incrémental de core.rollups
+# (même principe que 0006 : DDL figé dans la migration). InnoDB ajoute l'id à l'index.
+TABLE, NAME, COLUMNS = "transactions", "idx_transactions_created", ["created_at"]
+
+
+def _existing(cursor):
+    constraints = connection.introspection.get_constraints(cursor, TABLE)
+    return {name: c["columns"] for name, c in constraints.items() if c["index"] or c["unique"] or c["primary_key"]}
+
+
+def forwards(apps, schema_editor):
+    if connection.vendor != "mysql" or TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        if not any(cols[: len(COLUMNS)] == COLUMNS for cols in _existing(cursor).values()):
+            cursor.execute(f"CREATE INDEX {NAME} ON {TABLE} ({', '.join(COLUMNS)});")
+
+
+def backwards(apps, schema_editor):
+    if connection.vendor != "mysql" or TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        if NAME in _existing(cursor):
+            cursor.execute(f"DROP INDEX {NAME} ON {TABLE};")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0008_dailyridestats"),
+    ]
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
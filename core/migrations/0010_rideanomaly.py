@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_transactions_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RideAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.BigIntegerField()),
+                ('reason', models.CharField(max_length=12)),
+                ('distance_km', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('speed_kmh', models.DecimalField(blank=True, decimal_places=1, max_digits=10, null=True)),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['reason', 'reviewed_at'], name='idx_ride_anomaly_review')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rideanomaly',
+            constraint=models.UniqueConstraint(fields=('transaction_id', 'reason'), name='uniq_ride_anomaly'),
+        ),
+    ]
@@ -9,4 +9,105 @@ class BAProfile(models.Model):
     monthly_target = models.PositiveIntegerField(default=100)
     level = models.CharField(max_length=50, default="Brand Ambassador")
     def __str__(self):
-        return f"{self.user.username} profile"
\ No newline at end of file
+        return f"{self.user.username} profile"
+
+class LeaderboardEntry(models.Model):
+    """Snapshot du classement (top N), recalculé par `manage.py rebuild_leaderboard`."""
+    rank = models.PositiveIntegerField(unique=True)
+    ba_id = models.BigIntegerField()
+    name = models.CharField(max_length=201)
+    drivers = models.PositiveIntegerField(default=0)
+    recruits = models.PositiveIntegerField(default=0)
+    commission = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["rank"]
+
+    def __str__(self):
+        return f"#{self.rank} {self.name}"
+
+
+class JobCheckpoint(models.Model):
+    """Position de reprise d'un traitement par lots (dernier id / created_at traité)."""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    last_created_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Événement écrit dans la transaction d'enrôlement, traité plus tard par
+    `manage.py run_outbox` (commission, compteurs BA, notification).
+    """
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+
+    class Meta:
+        indexes = [models.Index(fields=["processed_at", "id"], name="idx_outbox_pending")]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk}"
+
+
+class DailyRideStats(models.Model):
+    """
+    Agrégats journaliers des transactions terminées, par chauffeur, passager ou
+    station (cf. core.rollups). Les rapports lisent cette table, jamais `transactions`.
+    """
+    DRIVER = "driver"
+    PASSENGER = "passenger"
+    STATION = "station"
+
+    dimension = models.CharField(max_length=10)
+    key_id = models.BigIntegerField()
+    day = models.DateField()
+    rides = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    commission = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    distance_km = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["dimension", "key_id", "day"], name="uniq_ride_stats"),
+        ]
+        indexes = [models.Index(fields=["dimension", "day"], name="idx_ride_stats_day")]
+
+    def __str__(self):
+        return f"{self.dimension} {self.key_id} @ {self.day}"
+
+
+class RideAnomaly(models.Model):
+    """
+    Transaction signalée par `recompute_distances` (cf. core.distances) pour
+    vérification : distance nulle, trop longue, vitesse invraisemblable, etc.
+    """
+    ZERO = "zero"
+    TOO_LONG = "too_long"
+    SPEED = "speed"
+    SHORTER = "shorter"
+    BAD_COORDS = "bad_coords"
+
+    transaction_id = models.BigIntegerField()
+    reason = models.CharField(max_length=12)
+    distance_km = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    speed_kmh = models.DecimalField(max_digits=10, decimal_places=1, null=True, blank=True)
+    detected_at = models.DateTimeField(auto_now_add=True)
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["transaction_id", "reason"], name="uniq_ride_anomaly"),
+        ]
+        indexes = [models.Index(fields=["reason", "reviewed_at"], name="idx_ride_anomaly_review")]
+
+    def __str__(self):
+        return f"{self.reason} #{self.transaction_id}"
@@ -0,0 +1,126 @@
+"""
+Notifications des BA (table legacy `notifications`).
+
+- compteur de non lues par BA en cache, tenu à jour à l'insertion et à la
+  lecture (après commit) : pas de COUNT(*) à chaque page, seulement quand la
+  clé est absente ou expirée ; une insertion qui trouve la clé absente y pose
+  un marqueur, pour qu'un COUNT lancé avant elle n'écrive pas un compteur périmé ;
+- broadcast() : diffusion à tous les BA (ou une liste), bulk_create par
+  paquets de chunk_size, une transaction par paquet ;
+- mark_all_read() / mark_read() : un seul UPDATE.
+
+Non lue = lu à 0 ou NULL (lignes créées par l'ancienne app).
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models_legacy import BrandAmbassadors, Notifications
+
+UNREAD_Q = Q(lu=0) | Q(lu__isnull=True)
+FEED_SIZE = 20
+
+
+def unread_key(ba_id) -> str:
+    return f"notif:{ba_id}:unread"
+
+
+def _ttl():
+    return getattr(settings, "NOTIFICATIONS_UNREAD_TTL", 300)
+
+
+def unread_count(ba_id) -> int:
+    key = unread_key(ba_id)
+    value = cache.get(key)
+    if isinstance(value, int):
+        return value
+    count = Notifications.objects.filter(UNREAD_Q, ba_id=ba_id).count()
+    if value is None:
+        # add : une insertion commitée pendant le COUNT a posé son marqueur, on n'écrase pas
+        cache.add(key, count, _ttl())
+    elif cache.get(key) == value:
+        # Marqueur déjà là avant le COUNT : le COUNT voit l'insertion
+        cache.set(key, count, _ttl())
+    return count
+
+
+def _adjust_unread(deltas):
+    """
+    Ajoute deltas[ba_id] aux compteurs présents en cache (un get_many + un set_many).
+    Un compteur absent reçoit un marqueur : il sera recompté à la prochaine lecture.
+    """
+    keys = {unread_key(ba_id): d for ba_id, d in deltas.items() if d}
+    current = cache.get_many(list(keys))
+    values = {k: max(0, v + keys[k]) for k, v in current.items() if isinstance(v, int)}
+    stale = f"stale:{uuid4().hex}"
+    values.update({k: stale for k in keys if k not in values})
+    cache.set_many(values, _ttl())
+
+
+def create_notifications(objs, batch_size=1000):
+    """bulk_create de Notifications (dans la transaction appelante) + compteurs après commit."""
+    Notifications.objects.bulk_create(objs, batch_size=batch_size)
+    deltas = {}
+    for n in objs:
+        deltas[n.ba_id] = deltas.get(n.ba_id, 0) + 1
+    transaction.on_commit(lambda: _adjust_unread(deltas))
+    return len(objs)
+
+
+def build_notification(ba_id, titre, message, type=None, data=None, now=None) -> Notifications:
+    return Notifications(
+        ba_id=ba_id, titre=titre, message=message, type=type, data=data,
+        lu=0, created_at=now or timezone.now(),
+    )
+
+
+def notify(ba_id, titre, message, type=None, data=None):
+    return create_notifications([build_notification(ba_id, titre, message, type, data)])
+
+
+def broadcast(titre, message, type=None, data=None, ba_ids=None, chunk_size=1000):
+    """
+    Envoie la même notification à tous les BA actifs (ou à `ba_ids`).
+    Parcours des BA par clé (id) et insertion par paquets. Renvoie le nombre créé.
+    """
+    now = timezone.now()
+    qs = BrandAmbassadors.objects.order_by("id")
+    qs = qs.filter(id__in=list(ba_ids)) if ba_ids is not None else qs.filter(statut__in=["ACTIF", "ACTIVE"])
+    created, last_id = 0, 0
+    while True:
+        ids = list(qs.filter(id__gt=last_id).values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            return created
+        with transaction.atomic():
+            created += create_notifications(
+                [build_notification(ba_id, titre, message, type, data, now) for ba_id in ids],
+                batch_size=chunk_size,
+            )
+        last_id = ids[-1]
+
+
+def get_feed(ba_id, limit=FEED_SIZE):
+    return list(
+        Notifications.objects.filter(ba_id=ba_id)
+        .only("id", "titre", "message", "type", "lu", "created_at")
+        .order_by("-created_at", "-id")[:limit]
+    )
+
+
+def mark_all_read(ba_id):
+    """Un seul UPDATE ; le compteur passe à 0 après commit. Renvoie le nombre de lignes lues."""
+    n = Notifications.objects.filter(UNREAD_Q, ba_id=ba_id).update(lu=1, date_lecture=timezone.now())
+    transaction.on_commit(lambda: cache.set(unread_key(ba_id), 0, _ttl()))
+    return n
+
+
+def mark_read(ba_id, ids):
+    n = Notifications.objects.filter(UNREAD_Q, ba_id=ba_id, id__in=list(ids)).update(
+        lu=1, date_lecture=timezone.now()
+    )
+    transaction.on_commit(lambda: _adjust_unread({ba_id: -n}))
+    return n
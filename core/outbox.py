@@ -0,0 +1,116 @@
+"""
+Outbox des enrôlements : la requête HTTP n'écrit que la recrue et un
+OutboxEvent (même transaction, donc rien n'est perdu ni créé en double).
+Le reste est différé au worker `manage.py run_outbox` :
+
+- création des commissions (bulk_create) ;
+- compteurs du BA (un UPDATE F() par BA et par paquet) ;
+- notification "nouvelle recrue" (cf. core.notifications).
+
+Les événements sont pris par paquets ordonnés sur l'id, verrouillés avec
+SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8) : plusieurs workers peuvent
+tourner sans traiter deux fois le même événement. Un paquet en erreur est
+rejoué événement par événement ; un événement qui échoue MAX_ATTEMPTS fois
+reste en base (last_error) pour analyse.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidate_ba_caches
+from .counters import increment_ba_counters
+from .models import OutboxEvent
+from .models_legacy import Chauffeurs, Commissions
+from .notifications import build_notification, create_notifications
+
+RECRUIT_ENROLLED = "recruit_enrolled"
+MAX_ATTEMPTS = 5
+
+
+def enrollment_event(recrue) -> OutboxEvent:
+    """Événement (non sauvegardé) d'une recrue déjà insérée (Chauffeurs ou Passagers)."""
+    return OutboxEvent(kind=RECRUIT_ENROLLED, payload={
+        "ba_id": recrue.ba_id,
+        "recrue_type": "CHAUFFEUR" if isinstance(recrue, Chauffeurs) else "PASSAGER",
+        "recrue_id": recrue.id,
+        "name": f"{recrue.prenom} {recrue.nom}".strip(),
+        "created_at": recrue.created_at.isoformat(),
+    })
+
+
+def enqueue_enrollment(recrue):
+    """À appeler dans la transaction qui vient d'insérer la recrue (Chauffeurs ou Passagers)."""
+    event = enrollment_event(recrue)
+    event.save(force_insert=True)
+    return event
+
+
+def pending_events():
+    return OutboxEvent.objects.filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+
+
+def _apply(events, now):
+    """Effets des événements (dans la transaction appelante). Renvoie les BA touchés."""
+    from .services import DRIVER_COMMISSION, PASSENGER_COMMISSION, build_commission
+
+    rules = {"CHAUFFEUR": DRIVER_COMMISSION, "PASSAGER": PASSENGER_COMMISSION}
+    commissions, notifications, per_ba = [], [], {}
+    for event in events:
+        if event.kind != RECRUIT_ENROLLED:
+            raise ValueError(f"Type d'événement inconnu : {event.kind}")
+        p = event.payload
+        rule = rules[p["recrue_type"]]
+        commissions.append(build_commission(p["ba_id"], rule, p["recrue_id"], event.created_at))
+        notifications.append(build_notification(
+            p["ba_id"],
+            "Nouvelle recrue",
+            f"{p['name']} enrôlé(e) : commission de {rule[1]} XAF en attente.",
+            type="COMMISSION",
+            data={"recrue_type": p["recrue_type"], "recrue_id": p["recrue_id"], "montant": rule[1]},
+            now=now,
+        ))
+        c = per_ba.setdefault(p["ba_id"], {"drivers": 0, "passengers": 0, "commission": 0})
+        c["drivers" if p["recrue_type"] == "CHAUFFEUR" else "passengers"] += 1
+        c["commission"] += rule[1]
+    Commissions.objects.bulk_create(commissions)
+    create_notifications(notifications)
+    for ba_id, c in per_ba.items():
+        increment_ba_counters(ba_id, **c)
+    return set(per_ba)
+
+
+def _process(events, now):
+    touched = _apply(events, now)
+    OutboxEvent.objects.filter(id__in=[e.id for e in events]).update(processed_at=now)
+    transaction.on_commit(lambda: invalidate_ba_caches(touched))
+
+
+def drain(batch_size=500, max_batches=None):
+    """Traite les événements en attente par paquets. Renvoie le nombre d'événements traités."""
+    done = batches = 0
+    while max_batches is None or batches < max_batches:
+        now = timezone.now()
+        with transaction.atomic():
+            events = list(pending_events().select_for_update(skip_locked=True).order_by("id")[:batch_size])
+            if not events:
+                break
+            try:
+                with transaction.atomic():
+                    _process(events, now)
+                done += len(events)
+            except Exception:
+                done += _process_one_by_one(events, now)
+        batches += 1
+    return done
+
+
+def _process_one_by_one(events, now):
+    ok = 0
+    for event in events:
+        try:
+            with transaction.atomic():
+                _process([event], now)
+            ok += 1
+        except Exception as e:
+            OutboxEvent.objects.filter(id=event.id).update(attempts=F("attempts") + 1, last_error=repr(e)[:2000])
+    return ok
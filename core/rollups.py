@@ -0,0 +1,205 @@
+"""
+Agrégats journaliers des courses (table legacy `transactions`) dans DailyRideStats :
+par chauffeur, par passager et par station (station du chauffeur).
+
+Traitement incrémental : seules les transactions postérieures au point de
+reprise (created_at, id) sont lues, par paquets ordonnés sur ce couple (index
+idx_transactions_created). Par paquet, dans une transaction qui verrouille le
+point de reprise (SELECT ... FOR UPDATE, relu à chaque paquet) : lecture du
+paquet, ajout aux lignes DailyRideStats (INSERT ... ON DUPLICATE KEY UPDATE
+rides = rides + VALUES(rides), ...), puis avancement du point de reprise. Un
+run interrompu reprend sans double compte ; deux runs simultanés (cron pendant
+un long rattrapage) se relaient paquet par paquet sans relire le même.
+
+Les transactions plus récentes que ROLLUP_LAG_MINUTES ne sont pas encore lues
+(une course en cours peut changer de statut). Une transaction NULL en
+created_at n'est jamais agrégée.
+
+Colonnes de synthèse recalculées depuis les agrégats (jamais depuis
+`transactions`) pour les recrues touchées : Chauffeurs.total_courses /
+courses_mois, Passagers.total_courses / courses_mois / montant_total_depense.
+Au premier run d'un nouveau mois, courses_mois est recalculé pour tous.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import DailyRideStats, JobCheckpoint
+from .models_legacy import Chauffeurs, Passagers, Transactions
+
+CHECKPOINT = "rollup_transactions"
+COMPLETED_STATUTS = ["TERMINEE", "TERMINE", "COMPLETED"]
+ZERO = Decimal("0")
+
+
+@dataclass
+class RollupReport:
+    scanned: int = 0
+    rides: int = 0
+    chunks: int = 0
+    drivers: int = 0
+    passengers: int = 0
+
+
+def _dec(value):
+    return value if value is not None else ZERO
+
+
+def _aggregate(rows, stations):
+    """{(dimension, key_id, jour): [courses, montant, commission, distance]} pour un paquet."""
+    out = {}
+
+    def add(dimension, key_id, day, amount, commission, distance):
+        if key_id is None:
+            return
+        acc = out.setdefault((dimension, key_id, day), [0, ZERO, ZERO, ZERO])
+        acc[0] += 1
+        acc[1] += amount
+        acc[2] += commission
+        acc[3] += distance
+
+    for _, created_at, statut, driver_id, passenger_id, montant, commission, distance in rows:
+        if statut not in COMPLETED_STATUTS:
+            continue
+        day = timezone.localdate(created_at)
+        values = (_dec(montant), _dec(commission), _dec(distance))
+        add(DailyRideStats.DRIVER, driver_id, day, *values)
+        add(DailyRideStats.PASSENGER, passenger_id, day, *values)
+        add(DailyRideStats.STATION, stations.get(driver_id), day, *values)
+    return out
+
+
+STAT_FIELDS = ("rides", "amount", "commission", "distance_km")
+
+
+def _upsert_sql(vendor, table, n_rows):
+    """
+    INSERT additif des agrégats : un compteur existant reçoit la somme, sans
+    lecture préalable. MySQL : ON DUPLICATE KEY UPDATE (pas de cible de conflit,
+    la clé uniq_ride_stats suffit) ; sinon ON CONFLICT (dimension, key_id, day).
+    """
+    qn = connection.ops.quote_name
+    columns = ("dimension", "key_id", "day") + STAT_FIELDS
+    rows = ", ".join(["(" + ", ".join(["%s"] * len(columns)) + ")"] * n_rows)
+    sql = f"INSERT INTO {qn(table)} ({', '.join(qn(c) for c in columns)}) VALUES {rows} "
+    if vendor == "mysql":
+        return sql + "ON DUPLICATE KEY UPDATE " + ", ".join(
+            f"{qn(f)} = {qn(f)} + VALUES({qn(f)})" for f in STAT_FIELDS
+        )
+    return sql + "ON CONFLICT (dimension, key_id, day) DO UPDATE SET " + ", ".join(
+        f"{qn(f)} = {qn(table)}.{qn(f)} + excluded.{qn(f)}" for f in STAT_FIELDS
+    )
+
+
+def _merge(aggregates, batch_size=1000):
+    """Ajoute les agrégats du paquet aux lignes DailyRideStats (INSERT additif, par lots)."""
+    items = list(aggregates.items())
+    table = DailyRideStats._meta.db_table
+    with connection.cursor() as cur:
+        for i in range(0, len(items), batch_size):
+            batch = items[i:i + batch_size]
+            cur.execute(
+                _upsert_sql(connection.vendor, table, len(batch)),
+                [v for key, values in batch for v in (*key, *values)],
+            )
+
+
+def _stats_sum(dimension, field, **filters):
+    """Sous-requête corrélée : SUM(field) des agrégats de la recrue (0 si aucun)."""
+    qs = (
+        DailyRideStats.objects.filter(dimension=dimension, key_id=OuterRef("pk"), **filters)
+        .order_by().values("key_id").annotate(v=Sum(field)).values("v")[:1]
+    )
+    output = DailyRideStats._meta.get_field(field)
+    return Coalesce(Subquery(qs, output_field=output), Value(0), output_field=output)
+
+
+def refresh_summaries(driver_ids=None, passenger_ids=None, now=None, batch_size=1000):
+    """
+    Recalcule les colonnes de synthèse depuis DailyRideStats : un UPDATE par lot
+    de recrues, avec sous-requêtes corrélées (rien ne remonte côté Python).
+    None = toutes les recrues présentes dans les agrégats. Renvoie (chauffeurs, passagers).
+    """
+    month_start = timezone.localdate(now or timezone.now()).replace(day=1)
+    done = []
+    for dimension, model, ids in (
+        (DailyRideStats.DRIVER, Chauffeurs, driver_ids),
+        (DailyRideStats.PASSENGER, Passagers, passenger_ids),
+    ):
+        if ids is None:
+            ids = DailyRideStats.objects.filter(dimension=dimension).values_list("key_id", flat=True).distinct()
+        ids = sorted(ids)
+        values = {
+            "total_courses": _stats_sum(dimension, "rides"),
+            "courses_mois": _stats_sum(dimension, "rides", day__gte=month_start),
+        }
+        if model is Passagers:
+            values["montant_total_depense"] = _stats_sum(dimension, "amount")
+        n = 0
+        for i in range(0, len(ids), batch_size):
+            n += model.objects.filter(id__in=ids[i:i + batch_size]).update(**values)
+        done.append(n)
+    return tuple(done)
+
+
+def rollup_transactions(chunk_size=5000, now=None, rebuild=False):
+    """Agrège les nouvelles transactions depuis le point de reprise. Renvoie un RollupReport."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(minutes=getattr(settings, "ROLLUP_LAG_MINUTES", 120))
+    report = RollupReport()
+    if rebuild:
+        with transaction.atomic():
+            DailyRideStats.objects.all().delete()
+            JobCheckpoint.objects.filter(name=CHECKPOINT).delete()
+    checkpoint, created = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    new_month = not created and timezone.localdate(checkpoint.updated_at) < timezone.localdate(now).replace(day=1)
+    qs = Transactions.objects.filter(created_at__isnull=False, created_at__lt=cutoff).order_by("created_at", "id")
+    while True:
+        with transaction.atomic():
+            # Un autre run a pu avancer le point de reprise : relu sous verrou à chaque paquet
+            checkpoint = JobCheckpoint.objects.select_for_update().get(pk=checkpoint.pk)
+            page = qs
+            if checkpoint.last_created_at is not None:
+                ts, last_id = checkpoint.last_created_at, checkpoint.last_id
+                page = qs.filter(Q(created_at__gt=ts) | Q(created_at=ts, id__gt=last_id))
+            rows = list(page.values_list(
+                "id", "created_at", "statut", "chauffeur_id", "passager_id", "montant",
+                "commission_montant", "distance_km",
+            )[:chunk_size])
+            if not rows:
+                break
+            driver_ids = {r[3] for r in rows}
+            passenger_ids = {r[4] for r in rows if r[4] is not None}
+            stations = dict(Chauffeurs.objects.filter(id__in=driver_ids).values_list("id", "station_id"))
+            _merge(_aggregate(rows, stations))
+            checkpoint.last_id, checkpoint.last_created_at = rows[-1][0], rows[-1][1]
+            checkpoint.save(update_fields=["last_id", "last_created_at", "updated_at"])
+            drivers, passengers = refresh_summaries(driver_ids, passenger_ids, now)
+        report.scanned += len(rows)
+        report.rides += sum(1 for r in rows if r[2] in COMPLETED_STATUTS)
+        report.drivers += drivers
+        report.passengers += passengers
+        report.chunks += 1
+    if new_month:
+        # courses_mois des recrues sans course ce mois-ci repart à zéro
+        drivers, passengers = refresh_summaries(now=now)
+        report.drivers += drivers
+        report.passengers += passengers
+    checkpoint.save(update_fields=["updated_at"])
+    return report
+
+
+def daily_totals(dimension, start, end, key_ids=None):
+    """Totaux par jour (start <= jour < end) lus dans DailyRideStats, pour un rapport."""
+    qs = DailyRideStats.objects.filter(dimension=dimension, day__gte=start, day__lt=end)
+    if key_ids is not None:
+        qs = qs.filter(key_id__in=list(key_ids))
+    return list(qs.order_by("day").values("day").annotate(
+        rides=Sum("rides"), amount=Sum("amount"), commission=Sum("commission"), distance_km=Sum("distance_km"),
+    ))
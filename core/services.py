@@ -1,14 +1,22 @@
 import re
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import Sum, Q
-from django.db import IntegrityError
+from django.db.models import Count, DateTimeField, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db import IntegrityError, connection, transaction
+from .cache import get_ba_revision, get_or_compute, invalidate_ba_cache
+from .challenges import get_ba_challenges
+from .counters import ACTIVE_DRIVER_Q, COUNTER_FIELDS, compute_ba_counters
+from .leaderboard import get_top
+from .outbox import enqueue_enrollment
+from .stations import all_stations, nearest_station, station_for_zone
 from .models_legacy import (
     BrandAmbassadors,
     Chauffeurs,
     Passagers,
     Commissions,
-    Challenges,
-    Stations,
 )
 
 
@@ -25,25 +33,41 @@ ZONES = [
 ]
 
 
+# Statuts de commission considérés comme "en attente" côté MySQL
+PENDING_STATUTS = ["PENDING", "EN_ATTENTE", "EN_COURS"]
+
+
 def get_zones():
     return ZONES
 
 
-    return station
 def get_or_create_station_for_zone(zone: str):
     zone = (zone or "").strip()
     if zone not in ZONES:
         raise ValueError("Zone invalide.")
-    station = Stations.objects.filter(nom=zone).order_by("id").first()
-    if station:
-        return station
-    return Stations.objects.create(
-        nom=zone,
-        ville=zone,
-        actif=1,
-        created_at=timezone.now(),
-        updated_at=timezone.now(),
-    )
+    # Servi par le registre en mémoire (cf. core.stations), sans requête dans le cas courant
+    return station_for_zone(zone)
+
+
+def parse_position(post):
+    """(lat, lon) des champs latitude / longitude du formulaire, None s'ils sont vides."""
+    raw_lat = (post.get("latitude") or "").strip()
+    raw_lon = (post.get("longitude") or "").strip()
+    if not raw_lat and not raw_lon:
+        return None
+    try:
+        lat, lon = float(raw_lat), float(raw_lon)
+    except ValueError:
+        raise ValueError("Position invalide.")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("Position invalide.")
+    return lat, lon
+
+
+def station_near(position):
+    """Station active la plus proche (index spatial en mémoire), None au-delà de STATIONS_MAX_KM."""
+    return nearest_station(*position, max_km=getattr(settings, "STATIONS_MAX_KM", 15))
+
 
 def normalize_and_validate_immatriculation(value: str) -> str:
     raw = (value or "").strip().upper()
@@ -54,13 +78,29 @@ def normalize_and_validate_immatriculation(value: str) -> str:
 
 
 
+# Champs du BA gardés en session (ordre = ordre des colonnes du modèle)
+BA_SNAPSHOT_FIELDS = ["id", "nom", "prenom", "email", "niveau", "rang", "serie_jours", "statut"]
+BA_SESSION_KEY = "_ba_snapshot"
+
+
 def get_ba_from_user(user) -> BrandAmbassadors:
     """
     Associe l'utilisateur Django au BA MySQL via email.
+    Le résultat est mémorisé sur l'objet user (donc une seule requête par requête HTTP).
+    """
+    ba = getattr(user, "_ba_cache", None)
+    if ba is None:
+        ba = _lookup_or_create_ba(user)
+        user._ba_cache = ba
+    return ba
+
+
+def _lookup_or_create_ba(user) -> BrandAmbassadors:
+    """
     Si le BA n'existe pas, on le crée (en évitant les collisions telephone unique).
     """
     email = (user.email or user.username or "").strip().lower()
-    ba = BrandAmbassadors.objects.filter(email=email).first()
+    ba = BrandAmbassadors.objects.filter(email=email).only(*BA_SNAPSHOT_FIELDS).first()
     if ba:
         return ba
     # ⚠️ telephone est UNIQUE dans ta table brand_ambassadors : on doit en fournir un.
@@ -79,16 +119,40 @@ def get_ba_from_user(user) -> BrandAmbassadors:
         password_hash="",   # si tu fais auth MySQL plus tard, tu stockeras un vrai hash
         niveau="Brand Ambassador",
         statut="ACTIF",
+        **dict.fromkeys(COUNTER_FIELDS, 0),
         created_at=timezone.now(),
         updated_at=timezone.now(),
     )
 
 
+def ba_snapshot(user, ba) -> dict:
+    data = {f: getattr(ba, f) for f in BA_SNAPSHOT_FIELDS}
+    data["uid"] = user.pk
+    data["rev"] = get_ba_revision(ba.id)
+    data["at"] = int(time.time())
+    return data
+
+
+def ba_from_snapshot(user, data):
+    """
+    Reconstruit le BA depuis la session si le snapshot est encore valide
+    (même user, même révision, pas expiré). Les autres champs restent différés.
+    """
+    if not data or data.get("uid") != user.pk:
+        return None
+    if time.time() - data.get("at", 0) > getattr(settings, "BA_SESSION_TTL", 300):
+        return None
+    if data.get("rev") != get_ba_revision(data["id"]):
+        return None
+    return BrandAmbassadors.from_db(
+        "default", BA_SNAPSHOT_FIELDS, [data[f] for f in BA_SNAPSHOT_FIELDS]
+    )
+
+
 def get_stations():
-    qs = Stations.objects.all()
     # On renvoie un format compatible template (id + name)
     out = []
-    for s in qs:
+    for s in all_stations():
         label = s.nom
         if getattr(s, "ville", None):
             label = f"{s.nom} - {s.ville}"
@@ -96,174 +160,334 @@ def get_stations():
     return out
 
 
-def get_recent_recruits(user):
+RECRUITS_PAGE_SIZE = 10
+
+
+def get_recent_recruits(user, before=None, limit=RECRUITS_PAGE_SIZE):
+    """
+    Fil des recrues (chauffeurs + passagers) trié par date décroissante.
+    `before` = curseur "<date iso>,<DRV-12|PAS-34>" de la dernière recrue affichée
+    (pagination par clé, sans OFFSET). Seule la première page est mise en cache.
+    """
     ba = get_ba_from_user(user)
-    drivers = Chauffeurs.objects.filter(ba_id=ba.id).order_by("-created_at")[:6]
-    passengers = Passagers.objects.filter(ba_id=ba.id).order_by("-created_at")[:6]
+    if before:
+        return get_recruits_page(ba.id, before=parse_recruit_cursor(before), limit=limit)
+    return get_or_compute(ba.id, "recruits", lambda: get_recruits_page(ba.id, limit=limit))
+
+
+def parse_recruit_cursor(value: str):
+    """ "2026-01-31T08:11:00+00:00,DRV-12" -> (datetime | None, "DRV", 12). Lève ValueError sinon."""
+    ts, _, rid = (value or "").rpartition(",")
+    kind, _, pk = rid.partition("-")
+    if kind not in ("DRV", "PAS"):
+        raise ValueError("Curseur invalide.")
+    created = datetime.fromisoformat(ts) if ts else None
+    if created and timezone.is_naive(created):
+        created = timezone.make_aware(created, dt_timezone.utc)
+    return created, kind, int(pk)
+
+
+def _recruit_branch(model, kind, ba_id, before, activated, limit):
+    qs = model.objects.filter(ba_id=ba_id)
+    if before:
+        ts, c_kind, c_id = before
+        # Ordre du fil : created_at DESC (vides en bas), kind DESC, id DESC
+        if kind == c_kind:
+            tie = Q(id__lt=c_id)
+        elif kind < c_kind:
+            tie = Q()
+        else:
+            tie = Q(pk__in=[])
+        if ts is None:
+            qs = qs.filter(Q(created_at__isnull=True) & tie)
+        else:
+            qs = qs.filter(Q(created_at__lt=ts) | Q(created_at__isnull=True) | (Q(created_at=ts) & tie))
+    qs = qs.annotate(kind=Value(kind), activated=activated).values(
+        "id", "nom", "prenom", "statut", "created_at", "kind", "activated"
+    )
+    if connection.features.supports_slicing_ordering_in_compound:
+        # MySQL : chaque branche ne lit que `limit` lignes via l'index (ba_id, created_at)
+        qs = qs.order_by("-created_at", "-id")[:limit]
+    return qs
+
+
+def get_recruits_page(ba_id, before=None, limit=RECRUITS_PAGE_SIZE):
+    """
+    Une seule requête : (chauffeurs UNION ALL passagers) ORDER BY created_at DESC LIMIT n.
+    Chaque recrue porte son `cursor` pour demander la page suivante.
+    """
+    drivers = _recruit_branch(Chauffeurs, "DRV", ba_id, before, F("date_activation"), limit)
+    passengers = _recruit_branch(
+        Passagers, "PAS", ba_id, before, Value(None, output_field=DateTimeField()), limit
+    )
+    rows = drivers.union(passengers, all=True).order_by("-created_at", "-kind", "-id")[:limit]
     out = []
-    for d in drivers:
-        is_active = bool(getattr(d, "date_activation", None)) or (getattr(d, "statut", "") in ["ACTIF", "ACTIVE"])
+    for r in rows:
+        is_driver = r["kind"] == "DRV"
+        is_active = r["statut"] in ["ACTIF", "ACTIVE"] or bool(r["activated"])
+        created = r["created_at"]
+        rid = f"{r['kind']}-{r['id']}"
         out.append({
-            "id": f"DRV-{d.id}",
-            "name": f"{d.prenom} {d.nom}".strip(),
-            "type": "Chauffeur",
-            "date": d.created_at.strftime("%d/%m/%Y") if d.created_at else "",
+            "id": rid,
+            "name": f"{r['prenom']} {r['nom']}".strip(),
+            "type": "Chauffeur" if is_driver else "Passager",
+            "date": created.strftime("%d/%m/%Y") if created else "",
             "status": "Activé" if is_active else "Inscrit",
-            "commission": 5000,
+            "commission": (DRIVER_COMMISSION if is_driver else PASSENGER_COMMISSION)[1],
+            "cursor": f"{created.isoformat() if created else ''},{rid}",
         })
-    for p in passengers:
-        is_active = (getattr(p, "statut", "") in ["ACTIF", "ACTIVE"])
-        out.append({
-            "id": f"PAS-{p.id}",
-            "name": f"{p.prenom} {p.nom}".strip(),
-            "type": "Passager",
-            "date": p.created_at.strftime("%d/%m/%Y") if p.created_at else "",
-            "status": "Activé" if is_active else "Inscrit",
-            "commission": 500,
-        })
-    # Tri par date (si vide, reste en bas)
-    return out[:10]
+    return out
+
+
+def _ba_aggregate(model, expr, **filters):
+    """
+    Sous-requête scalaire corrélée sur brand_ambassadors.id :
+    un seul agrégat conditionnel (Count/Sum avec filter=...) pour une table liée.
+    """
+    qs = (
+        model.objects.filter(ba_id=OuterRef("pk"), **filters)
+        .order_by()
+        .values("ba_id")
+        .annotate(v=expr)
+        .values("v")[:1]
+    )
+    if isinstance(expr, Sum):
+        return Coalesce(Subquery(qs), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2))
+    return Coalesce(Subquery(qs), Value(0))
+
+
+def _ba_stats_row(ba_id, month_start):
+    since_month = Q(created_at__gte=month_start)
+    return BrandAmbassadors.objects.filter(pk=ba_id).values(
+        *COUNTER_FIELDS,
+        # Activation faite hors de l'app (back-office) : chauffeurs_actifs n'est à jour
+        # qu'après un rebuild, on compte donc les actifs à la lecture
+        active_drivers=_ba_aggregate(Chauffeurs, Count("id", filter=ACTIVE_DRIVER_Q)),
+        monthly_drivers=_ba_aggregate(Chauffeurs, Count("id", filter=since_month)),
+        monthly_passengers=_ba_aggregate(Passagers, Count("id", filter=since_month)),
+        monthly_commission=_ba_aggregate(Commissions, Sum("montant", filter=since_month)),
+        pending_commission=_ba_aggregate(
+            Commissions, Sum("montant", filter=Q(statut__in=PENDING_STATUTS))
+        ),
+    ).first()
+
+
+def get_ba_stats(ba_id, month_start):
+    """
+    Compteurs du dashboard BA en UNE seule requête SQL : les totaux viennent des
+    compteurs matérialisés de brand_ambassadors (cf. core.counters) ; chauffeurs
+    actifs, agrégats du mois et en attente passent par des sous-requêtes
+    conditionnelles (indépendantes de brand_ambassadors.updated_at).
+    """
+    row = _ba_stats_row(ba_id, month_start)
+    if row is None:
+        return {
+            "total_drivers": 0,
+            "active_drivers": 0,
+            "monthly_drivers": 0,
+            "total_passengers": 0,
+            "monthly_passengers": 0,
+            "monthly_commission": 0,
+            "pending_commission": 0,
+        }
+    if any(row[f] is None for f in COUNTER_FIELDS):
+        # Compteurs jamais initialisés : calculés à la lecture, sans écrire
+        # (l'initialisation en base relève de `manage.py rebuild_ba_counters`)
+        row.update(compute_ba_counters([ba_id])[ba_id])
+    return {
+        "total_drivers": row["total_chauffeurs"],
+        "active_drivers": row["active_drivers"],
+        "monthly_drivers": row["monthly_drivers"],
+        "total_passengers": row["total_passagers"],
+        "monthly_passengers": row["monthly_passengers"],
+        "monthly_commission": row["monthly_commission"],
+        "pending_commission": row["pending_commission"],
+    }
+
+
+def _header_fields(ba):
+    return {
+        "name": f"{ba.prenom} {ba.nom}".strip(),
+        "level": ba.niveau or "Brand Ambassador",
+        "rank": ba.rang or 0,
+    }
+
+
+def get_ba_header(user):
+    """Nom, niveau et rang pour l'en-tête de l'app : BA de la session, sans agrégat."""
+    return _header_fields(get_ba_from_user(user))
 
 
 def get_dashboard_payload(user):
     ba = get_ba_from_user(user)
+    return get_or_compute(ba.id, "dashboard", lambda: _compute_dashboard_payload(user, ba))
+
+
+def _compute_dashboard_payload(user, ba):
     now = timezone.now()
     month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    total_drivers = Chauffeurs.objects.filter(ba_id=ba.id).count()
-    active_drivers = Chauffeurs.objects.filter(
-        ba_id=ba.id
-    ).filter(Q(statut__in=["ACTIF", "ACTIVE"]) | Q(date_activation__isnull=False)).count()
-    total_passengers = Passagers.objects.filter(ba_id=ba.id).count()
-    monthly_commission = Commissions.objects.filter(
-        ba_id=ba.id, created_at__gte=month_start
-    ).aggregate(s=Sum("montant"))["s"] or 0
-    pending_commission = Commissions.objects.filter(
-        ba_id=ba.id, statut__in=["PENDING", "EN_ATTENTE", "EN_COURS"]
-    ).aggregate(s=Sum("montant"))["s"] or 0
-    monthly_recruits = (
-        Chauffeurs.objects.filter(ba_id=ba.id, created_at__gte=month_start).count()
-        + Passagers.objects.filter(ba_id=ba.id, created_at__gte=month_start).count()
-    )
+    stats = get_ba_stats(ba.id, month_start)
+    monthly_recruits = stats["monthly_drivers"] + stats["monthly_passengers"]
     target = 100
     if hasattr(user, "ba_profile") and getattr(user.ba_profile, "monthly_target", None):
         target = user.ba_profile.monthly_target
     target_progress = int(min(100, (monthly_recruits / max(1, target)) * 100))
     return {
-        "name": f"{ba.prenom} {ba.nom}".strip(),
-        "level": ba.niveau or "Brand Ambassador",
-        "rank": ba.rang or 0,
-        "totalDrivers": total_drivers,
-        "activeDrivers": active_drivers,
-        "totalPassengers": total_passengers,
-        "monthlyCommission": float(monthly_commission),
-        "pendingCommission": float(pending_commission),
+        **_header_fields(ba),
+        "totalDrivers": stats["total_drivers"],
+        "activeDrivers": stats["active_drivers"],
+        "totalPassengers": stats["total_passengers"],
+        "monthlyCommission": float(stats["monthly_commission"] or 0),
+        "pendingCommission": float(stats["pending_commission"] or 0),
         "streak": ba.serie_jours or 0,
         "targetProgress": target_progress,
     }
 
 
 def get_challenges(user):
-    # Tu as aussi participations_challenges : on pourra calculer le vrai progress ensuite
-    today = timezone.now()
-    qs = Challenges.objects.filter(actif=1, date_debut__lte=today, date_fin__gte=today).order_by("date_fin")
-    out = []
-    for ch in qs:
-        out.append({
-            "id": ch.id,
-            "title": ch.titre,
-            "description": ch.description or "",
-            "progress": 0,
-            "endsIn": ch.date_fin.strftime("%d/%m/%Y") if ch.date_fin else "",
-        })
-    return out
+    ba = get_ba_from_user(user)
+    # Progression calculée depuis chauffeurs / passagers / commissions (cf. core.challenges)
+    return get_or_compute(ba.id, "challenges", lambda: get_ba_challenges(ba.id))
 
 
-def get_leaderboard():
-    # Option simple : basé sur rang/commission_totale si tu veux
-    # Ici on laisse vide ; on peut le brancher ensuite.
-    return []
+def get_leaderboard(limit=20):
+    # Snapshot précalculé par `manage.py rebuild_leaderboard` (cf. core.leaderboard)
+    return get_top(limit)
 
 
-def create_driver_enrollment(user, post):
-    ba = get_ba_from_user(user)
-    full = (post.get("name") or "").strip()
+# Commission versée au BA par type de recrue : (type, montant, recrue_type)
+DRIVER_COMMISSION = ("ENROLL_DRIVER", 5000, "CHAUFFEUR")  # ✅ corrigé (ton 'ChauffEUR' est bizarre)
+PASSENGER_COMMISSION = ("ENROLL_PASSENGER", 500, "PASSAGER")
+
+
+def split_full_name(full: str):
+    full = (full or "").strip()
     parts = full.split()
     nom = parts[-1] if parts else ""
     prenom = " ".join(parts[:-1]) if len(parts) > 1 else full
+    return nom, prenom
+
+
+def build_driver(ba_id, post, now=None, station_lookup=None) -> Chauffeurs:
+    """
+    Valide le formulaire chauffeur et renvoie l'instance Chauffeurs (non sauvegardée).
+    Lève ValueError si une donnée est invalide.
+    """
+    now = now or timezone.now()
+    nom, prenom = split_full_name(post.get("name"))
     phone = (post.get("phone") or "").strip()
     if not phone:
         raise ValueError("Téléphone obligatoire.")
-    # ✅ Zone -> station_id (on garde ton schéma existant: Chauffeurs.station_id FK Stations)
-    zone = (post.get("zone") or "").strip()
-    if not zone:
-        raise ValueError("Zone obligatoire.")
-    station = get_or_create_station_for_zone(zone)
+    # ✅ Position GPS -> station la plus proche ; sinon zone -> station_id
+    position = parse_position(post)
+    station = station_near(position) if position else None
+    if station is None:
+        zone = (post.get("zone") or "").strip()
+        if not zone:
+            raise ValueError("Zone obligatoire.")
+        station = (station_lookup or get_or_create_station_for_zone)(zone)
     # ✅ Adresse
     adresse = (post.get("address") or "").strip() or None
     # ✅ Immatriculation normalisée + 6 caractères
     vehicle_number = normalize_and_validate_immatriculation(post.get("vehicleNumber"))
     vehicle_model = (post.get("vehicleModel") or "N/A").strip()
     marque = (vehicle_model.split(" ")[0] if vehicle_model and vehicle_model != "N/A" else "N/A")
-    try:
-        d = Chauffeurs.objects.create(
-            ba_id=ba.id,
-            station_id=station.id,
-            nom=nom,
-            prenom=prenom,
-            telephone=phone,
-            email=(post.get("email") or "").strip() or None,
-            vehicule_immatriculation=vehicle_number,
-            vehicule_marque=marque,
-            vehicule_modele=vehicle_model,
-            vehicule_couleur="N/A",
-            # ⚠️ ce champ n’existe pas encore dans ta table chauffeurs -> voir étape “DB” plus bas
-            adresse=adresse,
-            photo_profil_url="temp.jpg",
-            photo_id_url="temp_id.jpg",
-            statut="INSCRIT",
-            created_at=timezone.now(),
-            updated_at=timezone.now(),
-        )
-    except IntegrityError as e:
-        raise Exception("Téléphone ou immatriculation déjà utilisés.") from e
-    Commissions.objects.create(
-        ba_id=ba.id,
-        type="ENROLL_DRIVER",
-        montant=5000,
-        recrue_type="CHAUFFEUR",  # ✅ corrigé (ton 'ChauffEUR' est bizarre)
-        recrue_id=d.id,
+    return Chauffeurs(
+        ba_id=ba_id,
+        station_id=station.id,
+        nom=nom,
+        prenom=prenom,
+        telephone=phone,
+        email=(post.get("email") or "").strip() or None,
+        vehicule_immatriculation=vehicle_number,
+        vehicule_marque=marque,
+        vehicule_modele=vehicle_model,
+        vehicule_couleur="N/A",
+        # ⚠️ ce champ n’existe pas encore dans ta table chauffeurs -> voir étape “DB” plus bas
+        adresse=adresse,
+        photo_profil_url="temp.jpg",
+        photo_id_url="temp_id.jpg",
+        statut="INSCRIT",
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def build_passenger(ba_id, post, now=None) -> Passagers:
+    now = now or timezone.now()
+    nom, prenom = split_full_name(post.get("name"))
+    phone = (post.get("phone") or "").strip()
+    if not phone:
+        raise ValueError("Téléphone obligatoire.")
+    return Passagers(
+        ba_id=ba_id,
+        nom=nom,
+        prenom=prenom,
+        telephone=phone,
+        email=(post.get("email") or "").strip() or None,
+        photo_profil_url="temp.jpg",
+        photo_id_url="temp_id.jpg",
+        statut="INSCRIT",
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def build_commission(ba_id, rule, recrue_id, now=None) -> Commissions:
+    type_, montant, recrue_type = rule
+    return Commissions(
+        ba_id=ba_id,
+        type=type_,
+        montant=montant,
+        recrue_type=recrue_type,
+        recrue_id=recrue_id,
         statut="PENDING",
-        created_at=timezone.now(),
+        created_at=now or timezone.now(),
+    )
+
+
+def check_driver_unique(phone, plate):
+    """
+    Vérifie téléphone et immatriculation en une seule requête, avant l'INSERT :
+    un doublon ne coûte ni IntegrityError ni verrou sur les index uniques.
+    """
+    taken = list(
+        Chauffeurs.objects.filter(Q(telephone=phone) | Q(vehicule_immatriculation=plate))
+        .values_list("telephone", "vehicule_immatriculation")[:2]
     )
+    if any(t == phone for t, _ in taken):
+        raise ValueError("Téléphone déjà utilisé.")
+    if taken:
+        raise ValueError("Immatriculation déjà utilisée.")
+
+
+def check_passenger_unique(phone):
+    if Passagers.objects.filter(telephone=phone).exists():
+        raise ValueError("Téléphone passager déjà utilisé.")
+
+
+def create_driver_enrollment(user, post):
+    ba = get_ba_from_user(user)
+    d = build_driver(ba.id, post)
+    check_driver_unique(d.telephone, d.vehicule_immatriculation)
+    try:
+        d.save(force_insert=True)
+    except IntegrityError as e:
+        # Course avec un autre enrôlement entre la vérification et l'INSERT
+        raise ValueError("Téléphone ou immatriculation déjà utilisés.") from e
+    # Commission, compteurs et notification : différés au worker (cf. core.outbox)
+    enqueue_enrollment(d)
+    # Le cache du dashboard n'est invalidé qu'une fois l'enrôlement réellement commité
+    transaction.on_commit(lambda: invalidate_ba_cache(ba.id))
 
 
 def create_passenger_enrollment(user, post):
     ba = get_ba_from_user(user)
-    full = (post.get("name") or "").strip()
-    parts = full.split()
-    nom = parts[-1] if parts else ""
-    prenom = " ".join(parts[:-1]) if len(parts) > 1 else full
+    p = build_passenger(ba.id, post)
+    check_passenger_unique(p.telephone)
     try:
-        p = Passagers.objects.create(
-            ba_id=ba.id,
-            nom=nom,
-            prenom=prenom,
-            telephone=(post.get("phone") or "").strip(),
-            email=(post.get("email") or "").strip() or None,
-            photo_profil_url="temp.jpg",
-            photo_id_url="temp_id.jpg",
-            statut="INSCRIT",
-            created_at=timezone.now(),
-            updated_at=timezone.now(),
-        )
+        p.save(force_insert=True)
     except IntegrityError as e:
-        raise Exception("Téléphone passager déjà utilisé.") from e
-    Commissions.objects.create(
-        ba_id=ba.id,
-        type="ENROLL_PASSENGER",
-        montant=500,
-        recrue_type="PASSAGER",
-        recrue_id=p.id,
-        statut="PENDING",
-        created_at=timezone.now(),
-    )
\ No newline at end of file
+        raise ValueError("Téléphone passager déjà utilisé.") from e
+    enqueue_enrollment(p)
+    transaction.on_commit(lambda: invalidate_ba_cache(ba.id))
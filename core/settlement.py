@@ -0,0 +1,116 @@
+"""
+Règlement des commissions : PENDING -> VALIDATED -> PAID.
+
+- validation : une commission en attente est validée (date_validation) dès que
+  sa recrue est active — chauffeur ACTIF ou avec date_activation, passager
+  ACTIF ou ayant déjà fait une course ;
+- paiement : les commissions validées (avant une date donnée) passent PAID
+  (date_paiement).
+
+Les commissions sont parcourues par paquets ordonnés sur l'id (keyset, mémoire
+bornée). Par paquet : une requête IN par type de recrue, puis un UPDATE ...
+WHERE id IN (...) AND statut = <ancien statut> (rejouer ne change rien).
+La position est enregistrée dans JobCheckpoint à chaque paquet : un run
+interrompu reprend là où il s'était arrêté.
+"""
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import invalidate_ba_caches
+from .counters import ACTIVE_DRIVER_Q
+from .models import JobCheckpoint
+from .models_legacy import Chauffeurs, Commissions, Passagers
+from .services import PENDING_STATUTS
+
+VALIDATED = "VALIDATED"
+PAID = "PAID"
+CHECKPOINT = "settlement"
+
+ACTIVE_PASSENGER_Q = Q(statut__in=["ACTIF", "ACTIVE"]) | Q(total_courses__gt=0)
+
+
+@dataclass
+class SettlementReport:
+    scanned: int = 0
+    validated: int = 0
+    paid: int = 0
+    chunks: int = 0
+
+
+def _active_recruits(rows):
+    """ids des commissions du paquet dont la recrue est active (1 requête par type)."""
+    by_type = {"CHAUFFEUR": set(), "PASSAGER": set()}
+    for _, _, recrue_type, recrue_id in rows:
+        if recrue_type in by_type and recrue_id is not None:
+            by_type[recrue_type].add(recrue_id)
+    active = {"CHAUFFEUR": set(), "PASSAGER": set()}
+    if by_type["CHAUFFEUR"]:
+        active["CHAUFFEUR"] = set(
+            Chauffeurs.objects.filter(ACTIVE_DRIVER_Q, id__in=by_type["CHAUFFEUR"]).values_list("id", flat=True)
+        )
+    if by_type["PASSAGER"]:
+        active["PASSAGER"] = set(
+            Passagers.objects.filter(ACTIVE_PASSENGER_Q, id__in=by_type["PASSAGER"]).values_list("id", flat=True)
+        )
+    return [cid for cid, _, recrue_type, recrue_id in rows if recrue_id in active.get(recrue_type, ())]
+
+
+def validate_commissions(chunk_size=1000, now=None, restart=False):
+    """Valide les commissions en attente dont la recrue est active. Renvoie un SettlementReport."""
+    now = now or timezone.now()
+    report = SettlementReport()
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    last_id = 0 if restart else checkpoint.last_id
+    while True:
+        rows = list(
+            Commissions.objects.filter(statut__in=PENDING_STATUTS, id__gt=last_id)
+            .order_by("id").values_list("id", "ba_id", "recrue_type", "recrue_id")[:chunk_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        ids = _active_recruits(rows)
+        with transaction.atomic():
+            if ids:
+                report.validated += Commissions.objects.filter(id__in=ids, statut__in=PENDING_STATUTS).update(
+                    statut=VALIDATED, date_validation=now
+                )
+            checkpoint.last_id = last_id
+            checkpoint.save(update_fields=["last_id", "updated_at"])
+        if ids:
+            validated = set(ids)
+            invalidate_ba_caches({ba_id for cid, ba_id, _, _ in rows if cid in validated})
+        report.scanned += len(rows)
+        report.chunks += 1
+    # Parcours complet : le prochain run repart du début (des recrues ont pu s'activer)
+    checkpoint.last_id = 0
+    checkpoint.save(update_fields=["last_id", "updated_at"])
+    return report
+
+
+def pay_commissions(validated_before=None, chunk_size=1000, now=None):
+    """
+    Passe PAID les commissions validées avant `validated_before` (toutes par défaut).
+    Les lignes payées sortent du filtre : un run interrompu se relance tel quel.
+    """
+    now = now or timezone.now()
+    report = SettlementReport()
+    qs = Commissions.objects.filter(statut=VALIDATED)
+    if validated_before is not None:
+        qs = qs.filter(date_validation__lt=validated_before)
+    last_id = 0
+    while True:
+        rows = list(qs.filter(id__gt=last_id).order_by("id").values_list("id", "ba_id")[:chunk_size])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        report.paid += Commissions.objects.filter(id__in=[r[0] for r in rows], statut=VALIDATED).update(
+            statut=PAID, date_paiement=now
+        )
+        invalidate_ba_caches({r[1] for r in rows})
+        report.scanned += len(rows)
+        report.chunks += 1
+    return report
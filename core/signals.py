@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .auth import cache_user, invalidate_cached_user
+from .cache import bump_ba_revision
+from .models import BAProfile
+from .models_legacy import BrandAmbassadors, Stations
+from .stations import bump_stations_version
+
+
+@receiver(post_save, sender=BrandAmbassadors)
+def ba_changed(sender, instance, **kwargs):
+    # Invalide les snapshots de session du BA (cf. BrandAmbassadorMiddleware)
+    bump_ba_revision(instance.pk)
+
+
+@receiver(post_save, sender=Stations)
+@receiver(post_delete, sender=Stations)
+def station_changed(sender, instance, **kwargs):
+    # Les registres de stations des workers se rechargent au prochain accès
+    bump_stations_version()
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    # L'utilisateur mis en cache par CachedModelBackend est relu au prochain accès
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=BAProfile)
+@receiver(post_delete, sender=BAProfile)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
+
+
+@receiver(user_logged_in)
+def prime_on_login(sender, request, user, **kwargs):
+    # Première page après connexion : utilisateur déjà en cache, BA déjà en session
+    # (écrit avec la session de connexion, pas une écriture de plus à la page suivante).
+    # Reçu après update_last_login, qui vient d'invalider l'utilisateur en cache.
+    from .services import BA_SESSION_KEY, ba_snapshot, get_ba_from_user
+
+    cache_user(user)
+    if getattr(user, "ba_profile", None) is not None and hasattr(request, "session"):
+        request.session[BA_SESSION_KEY] = ba_snapshot(user, get_ba_from_user(user))
@@ -0,0 +1,308 @@
+"""
+Registre des stations en mémoire (par process), indexé par zone (= Stations.nom).
+
+- chargé une fois (au démarrage du worker ou au premier accès) ;
+- rechargé quand le tampon de version en cache change (création / modification
+  d'une station via l'ORM) ou au bout de STATIONS_REFRESH secondes (modifications
+  faites directement dans MySQL) ;
+- création d'une station manquante (MySQL) sur une connexion dédiée en
+  autocommit : GET_LOCK, relecture, INSERT commité, puis RELEASE_LOCK. Le
+  suivant voit donc la station (rien ne dépend de la transaction d'enrôlement
+  encore ouverte) : deux enrôlements simultanés sur une nouvelle zone ne créent
+  pas deux stations. Verrou non obtenu en 10 s : ValueError, rien n'est créé.
+  Autres bases (dev / tests) : verrou de process seulement.
+- le verrou du registre (_lock) ne protège que la mise à jour de _state, jamais
+  une attente sur la base.
+
+Index spatial : grille de cellules de GRID_DEG degrés sur les stations actives
+géolocalisées, reconstruite avec le registre. nearest_station() parcourt les
+anneaux de cellules autour du point et s'arrête dès qu'aucune cellule plus
+lointaine ne peut contenir plus proche ; stations_within() ne lit que les
+cellules du carré englobant. Distances en km (haversine).
+
+reassign_drivers() (commande `reassign_driver_stations`) rattache chaque
+chauffeur à la station la plus proche de la majorité de ses points de départ.
+"""
+import math
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.utils import timezone
+
+from .models_legacy import Chauffeurs, Stations, Transactions
+
+VERSION_KEY = "stations:version"
+GRID_DEG = 0.05  # ~5,5 km en latitude
+EARTH_KM = 6371.0088
+KM_PER_DEG = math.pi * EARTH_KM / 180
+
+_lock = threading.Lock()
+_create_lock = threading.Lock()
+LOCK_TIMEOUT = 10
+_state = {"version": None, "loaded_at": 0.0, "by_zone": {}, "all": [], "grid": {}, "bounds": None}
+
+
+def bump_stations_version():
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def _cell(lat, lon):
+    return math.floor(lat / GRID_DEG), math.floor(lon / GRID_DEG)
+
+
+def _build_grid(stations):
+    """{cellule: [(lat, lon, station)]} des stations actives géolocalisées + bornes (i, j) occupées."""
+    grid = {}
+    for s in stations:
+        # actif NULL (lignes de l'ancienne app) : considérée active
+        if s.actif == 0 or s.latitude is None or s.longitude is None:
+            continue
+        lat, lon = float(s.latitude), float(s.longitude)
+        grid.setdefault(_cell(lat, lon), []).append((lat, lon, s))
+    if not grid:
+        return grid, None
+    rows = [i for i, _ in grid]
+    cols = [j for _, j in grid]
+    return grid, (min(rows), max(rows), min(cols), max(cols))
+
+
+def _load(version):
+    by_zone, ordered = {}, []
+    for s in Stations.objects.order_by("id"):
+        ordered.append(s)
+        # En cas de doublon historique, la station la plus ancienne gagne
+        by_zone.setdefault(s.nom, s)
+    grid, bounds = _build_grid(ordered)
+    with _lock:
+        _state.update(version=version, loaded_at=time.monotonic(), by_zone=by_zone, all=ordered,
+                      grid=grid, bounds=bounds)
+
+
+def _ensure_fresh():
+    version = cache.get(VERSION_KEY)
+    max_age = getattr(settings, "STATIONS_REFRESH", 300)
+    if (
+        _state["version"] == version
+        and _state["loaded_at"]
+        and time.monotonic() - _state["loaded_at"] < max_age
+    ):
+        return
+    _load(version)
+
+
+def warm_station_registry():
+    _load(cache.get(VERSION_KEY))
+
+
+def all_stations():
+    _ensure_fresh()
+    return _state["all"]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((p2 - p1) / 2) ** 2
+        + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _ring(ci, cj, r):
+    """Cellules à exactement r cellules (Chebyshev) de (ci, cj)."""
+    if r == 0:
+        yield ci, cj
+        return
+    for j in range(cj - r, cj + r + 1):
+        yield ci - r, j
+        yield ci + r, j
+    for i in range(ci - r + 1, ci + r):
+        yield i, cj - r
+        yield i, cj + r
+
+
+def _deg_km(lat, deg_away):
+    """Km par degré de longitude au pire jusqu'à deg_away degrés du point (rétrécit avec la latitude)."""
+    return KM_PER_DEG * math.cos(math.radians(min(89.0, abs(lat) + deg_away)))
+
+
+def _scan(lat, lon, cells):
+    for cell in cells:
+        for slat, slon, station in cell:
+            yield haversine_km(lat, lon, slat, slon), station
+
+
+def nearest_station(lat, lon, max_km=None):
+    """Station active la plus proche du point (None si aucune, ou aucune à moins de max_km)."""
+    _ensure_fresh()
+    grid, bounds = _state["grid"], _state["bounds"]
+    if bounds is None:
+        return None
+    ci, cj = _cell(lat, lon)
+    # Au-delà de cet anneau il n'y a plus aucune cellule occupée
+    last = max(0, ci - bounds[0], bounds[1] - ci, cj - bounds[2], bounds[3] - cj)
+    best, best_km = None, math.inf
+    for r in range(last + 1):
+        if 8 * r > len(grid):
+            # Point loin de tout : moins de cellules occupées que de cellules dans l'anneau
+            cells = grid.values()
+        else:
+            cells = (grid[c] for c in _ring(ci, cj, r) if c in grid)
+        for d, station in _scan(lat, lon, cells):
+            if d < best_km:
+                best, best_km = station, d
+        if 8 * r > len(grid):
+            break
+        # Toute station pas encore vue est à au moins r cellules pleines du point
+        floor_km = r * GRID_DEG * _deg_km(lat, (r + 1) * GRID_DEG)
+        if best_km <= floor_km or (max_km is not None and floor_km > max_km):
+            break
+    if max_km is not None and best_km > max_km:
+        return None
+    return best
+
+
+def stations_within(lat, lon, km):
+    """[(distance_km, station)] des stations actives à moins de `km` du point, de la plus proche à la plus loin."""
+    _ensure_fresh()
+    grid = _state["grid"]
+    ci, cj = _cell(lat, lon)
+    di = math.ceil(km / (GRID_DEG * KM_PER_DEG))
+    dj = math.ceil(km / (GRID_DEG * _deg_km(lat, (di + 1) * GRID_DEG)))
+    if (2 * di + 1) * (2 * dj + 1) > len(grid):
+        cells = grid.values()
+    else:
+        cells = (grid[(i, j)] for i in range(ci - di, ci + di + 1)
+                 for j in range(cj - dj, cj + dj + 1) if (i, j) in grid)
+    out = [(d, station) for d, station in _scan(lat, lon, cells) if d <= km]
+    out.sort(key=lambda x: (x[0], x[1].id))
+    return out
+
+
+def _create_committed(zone):
+    """
+    MySQL : relecture + INSERT de la station sous GET_LOCK, sur une connexion à
+    part en autocommit (commitée avant RELEASE_LOCK). Renvoie (station, créée).
+    """
+    name = f"taxiconnect:station:{zone}"
+    conn = connections.create_connection(DEFAULT_DB_ALIAS)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT GET_LOCK(%s, %s)", [name, LOCK_TIMEOUT])
+            if cur.fetchone()[0] != 1:
+                # 0 = délai dépassé, NULL = erreur : on ne crée rien sans le verrou
+                raise ValueError("Station en cours de création, réessayez.")
+            try:
+                cur.execute("SELECT id, ville, actif FROM stations WHERE nom = %s ORDER BY id LIMIT 1", [zone])
+                row = cur.fetchone()
+                if row is not None:
+                    return Stations(id=row[0], nom=zone, ville=row[1], actif=row[2]), False
+                now = conn.ops.adapt_datetimefield_value(timezone.now())
+                cur.execute(
+                    "INSERT INTO stations (nom, ville, actif, created_at, updated_at) VALUES (%s, %s, 1, %s, %s)",
+                    [zone, zone, now, now],
+                )
+                return Stations(id=cur.lastrowid, nom=zone, ville=zone, actif=1), True
+            finally:
+                cur.execute("SELECT RELEASE_LOCK(%s)", [name])
+    finally:
+        conn.close()
+
+
+def station_for_zone(zone: str):
+    """Station de la zone (nom déjà validé), créée si besoin."""
+    _ensure_fresh()
+    station = _state["by_zone"].get(zone)
+    if station is not None:
+        return station
+    if connection.vendor == "mysql":
+        station, created = _create_committed(zone)
+        if created:
+            # INSERT brut : pas de post_save, les autres workers sont prévenus ici
+            bump_stations_version()
+        _remember(zone, station)
+        return station
+    with _create_lock:
+        station = Stations.objects.filter(nom=zone).order_by("id").first()
+        if station is None:
+            station = Stations.objects.create(
+                nom=zone,
+                ville=zone,
+                actif=1,
+                created_at=timezone.now(),
+                updated_at=timezone.now(),
+            )
+    # N'entre dans le registre qu'une fois commitée (pas de station fantôme après rollback)
+    transaction.on_commit(lambda: _remember(zone, station))
+    return station
+
+
+def _remember(zone, station):
+    with _lock:
+        _state["by_zone"] = {**_state["by_zone"], zone: station}
+
+
+@dataclass
+class ReassignReport:
+    drivers: int = 0
+    rides: int = 0
+    moved: int = 0
+    chunks: int = 0
+
+
+def reassign_drivers(since=None, min_rides=3, max_km=None, chunk_size=1000, dry_run=False):
+    """
+    Rattache chaque chauffeur à la station la plus fréquente parmi les stations
+    les plus proches de ses départs de course (depuis `since`), s'il a au moins
+    `min_rides` départs à moins de max_km d'une station. Chauffeurs parcourus
+    par clé (id), un UPDATE par station cible et par paquet. Renvoie un ReassignReport.
+    """
+    if max_km is None:
+        max_km = getattr(settings, "STATIONS_MAX_KM", 15)
+    now = timezone.now()
+    report = ReassignReport()
+    # Points arrondis à 1e-3 degré (~100 m) : une recherche par point distinct
+    nearest = {}
+    rides = Transactions.objects.filter(depart_latitude__isnull=False, depart_longitude__isnull=False)
+    if since is not None:
+        rides = rides.filter(created_at__gte=since)
+    last_id = 0
+    while True:
+        drivers = list(
+            Chauffeurs.objects.filter(id__gt=last_id).order_by("id").values_list("id", "station_id")[:chunk_size]
+        )
+        if not drivers:
+            return report
+        last_id = drivers[-1][0]
+        votes = {}
+        for driver_id, lat, lon in rides.filter(chauffeur_id__in=[d for d, _ in drivers]).values_list(
+            "chauffeur_id", "depart_latitude", "depart_longitude"
+        ):
+            point = (round(float(lat), 3), round(float(lon), 3))
+            if point not in nearest:
+                nearest[point] = nearest_station(*point, max_km=max_km)
+            station = nearest[point]
+            report.rides += 1
+            if station is not None:
+                votes.setdefault(driver_id, Counter())[station.id] += 1
+        moves = {}
+        for driver_id, current in drivers:
+            counts = votes.get(driver_id)
+            if not counts or sum(counts.values()) < min_rides:
+                continue
+            # Égalité : la station d'id le plus petit, pour un résultat stable d'un run à l'autre
+            station_id = max(counts.items(), key=lambda kv: (kv[1], -kv[0]))[0]
+            if station_id != current:
+                moves.setdefault(station_id, []).append(driver_id)
+        if moves and not dry_run:
+            with transaction.atomic():
+                for station_id, ids in moves.items():
+                    Chauffeurs.objects.filter(id__in=ids).update(station_id=station_id, updated_at=now)
+        report.drivers += len(drivers)
+        report.moved += sum(len(ids) for ids in moves.values())
+        report.chunks += 1
@@ -1,9 +1,23 @@
-from django.urls import path
-from . import views
+from django.conf import settings
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+from . import api, views
+
+router = DefaultRouter()
+router.register("drivers", api.DriverViewSet, basename="api-drivers")
+router.register("passengers", api.PassengerViewSet, basename="api-passengers")
+router.register("commissions", api.CommissionViewSet, basename="api-commissions")
+router.register("notifications", api.NotificationViewSet, basename="api-notifications")
 urlpatterns = [
     path("", views.login_page, name="login"),
     path("logout/", views.logout_view, name="logout"),
-    path("app/", views.ba_app, name="ba_app"),
+    # En mode ASGI (SERVER_MODE=asgi), /app/ est servi par la vue async
+    path("app/", views.ba_app_async if getattr(settings, "BA_APP_ASYNC", False) else views.ba_app, name="ba_app"),
+    path("app/async/", views.ba_app_async, name="ba_app_async"),
+    path("app/tab/<str:tab>/", views.ba_app_tab, name="ba_app_tab"),
     path("app/enroll/driver/", views.enroll_driver, name="enroll_driver"),
     path("app/enroll/passenger/", views.enroll_passenger, name="enroll_passenger"),
+    path("app/notifications/read/", views.read_notifications, name="read_notifications"),
+    path("api/", include(router.urls)),
+    path("metrics", views.metrics, name="metrics"),
 ]
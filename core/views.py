@@ -1,14 +1,27 @@
+import asyncio
+import hmac
+
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.db import transaction
+from django.contrib.auth.views import redirect_to_login
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.http import Http404, HttpResponse, HttpResponseForbidden
 from django.shortcuts import render, redirect
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from .auth import CACHED_BACKEND
+from .idempotency import IDEMPOTENCY_FIELD, new_key, run_once
+from .metrics import render_prometheus
 from .models import BAProfile
 from .models_legacy import BrandAmbassadors
+from .notifications import get_feed, mark_all_read, unread_count
 from .services import (
     get_dashboard_payload, get_challenges, get_leaderboard, get_recent_recruits, get_stations,
-    create_driver_enrollment, create_passenger_enrollment, get_zones
+    create_driver_enrollment, create_passenger_enrollment, get_zones, get_ba_from_user, get_ba_header,
+    RECRUITS_PAGE_SIZE,
 )
 
 
@@ -68,7 +81,7 @@ def login_page(request):
                     }
                 )
                 # 4) Login
-                login(request, u)
+                login(request, u, backend=CACHED_BACKEND)
                 return redirect("ba_app")
     return render(request, "core/login.html", {"mode": mode})
 
@@ -78,41 +91,173 @@ def logout_view(request):
     return redirect("login")
 
 
-@login_required
-def ba_app(request):
-    tab = request.GET.get("tab", "dashboard")
+def _recruits(user, before):
+    try:
+        return get_recent_recruits(user, before=before)
+    except ValueError:
+        return get_recent_recruits(user)
+
+
+# Onglets de l'app et données lues par le template de chacun (core/tabs/<onglet>.html).
+# L'en-tête (layout) lit toujours `header` et `unread`.
+TAB_DATA = {
+    "dashboard": ("ba", "challenges"),
+    "enroll": (),
+    "recruits": ("recruits",),
+    "leaderboard": ("leaderboard",),
+    "commissions": ("ba",),
+    "notifications": ("notifications",),
+}
+LAYOUT_DATA = ("header", "unread")
+
+
+def _tab(value):
+    return value if value in TAB_DATA else "dashboard"
+
+
+def _providers(request):
+    """Calcul de chaque entrée du contexte de l'app (fonctions sans argument)."""
+    user = request.user
+    before = request.GET.get("before")
+    return {
+        "header": lambda: get_ba_header(user),
+        "unread": lambda: unread_count(get_ba_from_user(user).id),
+        "ba": lambda: get_dashboard_payload(user),
+        "challenges": lambda: get_challenges(user),
+        "leaderboard": get_leaderboard,
+        "recruits": lambda: _recruits(user, before),
+        "notifications": lambda: get_feed(get_ba_from_user(user).id),
+    }
+
+
+def _app_context(request, tab, values=None):
+    """
+    Chaque entrée est paresseuse (SimpleLazyObject) : calculée une seule fois, et
+    seulement si le template rendu y touche. `values` : entrées déjà calculées.
+    """
+    values = values or {}
     ctx = {
+        name: values[name] if name in values else SimpleLazyObject(func)
+        for name, func in _providers(request).items()
+    }
+    ctx.update({
         "tab": tab,
-        "ba": get_dashboard_payload(request.user),
-        "challenges": get_challenges(request.user),
-        "leaderboard": get_leaderboard(),
-        "recruits": get_recent_recruits(request.user),
+        "tab_template": f"core/tabs/{tab}.html",
+        "recruits_more": SimpleLazyObject(lambda: len(ctx["recruits"]) >= RECRUITS_PAGE_SIZE),
         "zones": get_zones(),
-    }
-    return render(request, "core/app.html", ctx)
+        # Nouvelle clé à chaque affichage : un double envoi du formulaire la réutilise
+        "idempotency_field": IDEMPOTENCY_FIELD,
+        "idempotency_key": new_key(),
+    })
+    return ctx
 
 
 @login_required
-@transaction.atomic
-def enroll_driver(request):
-    if request.method != "POST":
-        return redirect("ba_app")
+def ba_app(request):
+    tab = _tab(request.GET.get("tab"))
+    return render(request, "core/app.html", _app_context(request, tab))
+
+
+@login_required
+def ba_app_tab(request, tab):
+    """Fragment HTML d'un seul onglet (changement d'onglet sans recharger la page)."""
+    if tab not in TAB_DATA:
+        raise Http404
+    return render(request, f"core/tabs/{tab}.html", _app_context(request, tab))
+
+
+async def _in_thread(func, *args):
+    """
+    Exécute un service ORM dans son propre thread (donc sa propre connexion DB),
+    puis libère la connexion. Les appels de l'ORM async de Django passent tous par
+    le même thread "thread_sensitive" : ils seraient exécutés l'un après l'autre.
+    """
+    def run():
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return await sync_to_async(run, thread_sensitive=False)()
+
+
+def _authenticated_user(request):
+    if not request.user.is_authenticated:
+        return None
+    # BA résolu une fois (mémoïsé sur user) avant de lancer les requêtes en parallèle
+    get_ba_from_user(request.user)
+    return request.user
+
+
+async def ba_app_async(request):
+    """Variante ASGI de ba_app : les blocs de données de l'onglet sont chargés en parallèle."""
+    # request.user (et non auser()) : c'est sur cet objet que BrandAmbassadorMiddleware
+    # a déjà posé le BA lu en session
+    user = await sync_to_async(_authenticated_user)(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+    tab = _tab(request.GET.get("tab"))
+    # Seules les données de l'onglet affiché (et de l'en-tête) sont calculées, en parallèle
+    providers = _providers(request)
+    names = LAYOUT_DATA + TAB_DATA[tab]
+    results = await asyncio.gather(*(_in_thread(providers[name]) for name in names))
+    ctx = _app_context(request, tab, dict(zip(names, results)))
+    # Le rendu lit la session (messages) : il reste synchrone
+    return await sync_to_async(render)(request, "core/app.html", ctx)
+
+
+def _enroll(request, scope, create, label):
+    """
+    Enrôlement idempotent : un renvoi du même formulaire (même clé) reçoit le
+    message du premier envoi, sans nouvelle transaction (cf. core.idempotency).
+    """
+    def attempt():
+        try:
+            with transaction.atomic():
+                create(request.user, request.POST)
+        except ValueError as e:
+            return messages.ERROR, f"❌ Échec enrôlement {label}: {e}"
+        return messages.SUCCESS, f"✅ Enrôlement {label} réussi !"
+
     try:
-        create_driver_enrollment(request.user, request.POST)
-        messages.success(request, "✅ Enrôlement chauffeur réussi !")
+        level, text = run_once(
+            scope, request.user.pk, request.POST.get(IDEMPOTENCY_FIELD), attempt,
+            pending=(messages.INFO, "⏳ Enrôlement déjà en cours de traitement."),
+        )
     except Exception as e:
-        messages.error(request, f"❌ Échec enrôlement chauffeur: {str(e)}")
+        level, text = messages.ERROR, f"❌ Échec enrôlement {label}: {str(e)}"
+    messages.add_message(request, level, text)
     return redirect("/app/?tab=dashboard")
 
 
 @login_required
-@transaction.atomic
+def enroll_driver(request):
+    if request.method != "POST":
+        return redirect("ba_app")
+    return _enroll(request, "enroll_driver", create_driver_enrollment, "chauffeur")
+
+
+@login_required
 def enroll_passenger(request):
     if request.method != "POST":
         return redirect("ba_app")
-    try:
-        create_passenger_enrollment(request.user, request.POST)
-        messages.success(request, "✅ Enrôlement passager réussi !")
-    except Exception as e:
-        messages.error(request, f"❌ Échec enrôlement passager: {str(e)}")
-    return redirect("/app/?tab=dashboard")
\ No newline at end of file
+    return _enroll(request, "enroll_passenger", create_passenger_enrollment, "passager")
+
+
+@login_required
+def read_notifications(request):
+    if request.method == "POST":
+        mark_all_read(get_ba_from_user(request.user).id)
+    return redirect("/app/?tab=notifications")
+
+
+def metrics(request):
+    """Compteurs Prometheus du worker qui répond (cf. core.metrics)."""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token:
+        # Pas de jeton configuré : endpoint désactivé
+        raise Http404
+    # Comparaison à temps constant : le jeton ne se devine pas caractère par caractère
+    given = request.headers.get("Authorization", "").encode()
+    if not hmac.compare_digest(given, f"Bearer {token}".encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
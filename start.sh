@@ -0,0 +1,13 @@
+#!/bin/sh
+# Démarrage du conteneur.
+#   SERVER_MODE=wsgi (défaut) : gunicorn synchrone
+#   SERVER_MODE=asgi          : gunicorn + workers uvicorn, /app/ servi par la vue async
+set -e
+WORKERS="${WEB_WORKERS:-3}"
+TIMEOUT="${WEB_TIMEOUT:-120}"
+if [ "$SERVER_MODE" = "asgi" ]; then
+  export BA_APP_ASYNC=1
+  exec gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker \
+    --bind 0.0.0.0:8000 --workers "$WORKERS" --timeout "$TIMEOUT"
+fi
+exec gunicorn config.wsgi:application --bind 0.0.0.0:8000 --workers "$WORKERS" --timeout "$TIMEOUT"